@@ -0,0 +1,109 @@
+"""Mongo commands per board read as the number of task lists grows
+
+Creates a plan for a throwaway user, then grows it to each --lists count,
+with --tasks-per-list tasks in every list. After each step it reads the
+board through both board endpoints and counts the commands each read
+issued, from the per-route counts of mongo_command_duration_seconds that
+the command monitor exports on /api/v1/metrics/. The server needs
+METRICS_ENABLED and COMMAND_MONITORING, the defaults.
+
+The query commands (find, aggregate, count) stay the same at every size.
+Only getMore grows, once the tasks outgrow the first cursor batch.
+
+Usage: python -m backend.benchmarks.board_round_trips [--base-url http://localhost:8000] [--lists 1 10 50 100]
+"""
+import argparse
+import asyncio
+import json
+import re
+import uuid
+from collections import Counter
+import httpx
+
+COMMAND_COUNT = re.compile(r"^mongo_command_duration_seconds_count\{(?P<labels>.*)\} (?P<value>\S+)$")
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+BOARD_ROUTES = {
+    "plan_with_all": ("GET /api/v1/plans/{plan_id}", "/api/v1/plans/{plan_id}?include_all=true"),
+    "task_lists_with_tasks": ("GET /api/v1/plans/{plan_id}/task-lists",
+                              "/api/v1/plans/{plan_id}/task-lists?include_tasks=true&limit=100"),
+}
+
+
+async def command_counts(client: httpx.AsyncClient, route: str) -> Counter:
+    """Commands issued so far by route, by command name"""
+    response = await client.get("/api/v1/metrics/")
+    response.raise_for_status()
+    counts = Counter()
+    for line in response.text.splitlines():
+        match = COMMAND_COUNT.match(line)
+        if match:
+            labels = dict(LABEL.findall(match["labels"]))
+            if labels.get("route") == route:
+                counts[labels["command"]] += int(float(match["value"]))
+    return counts
+
+
+async def import_ndjson(client: httpx.AsyncClient, plan_id: str, kind: str, records: list):
+    body = "\n".join(json.dumps(record) for record in records).encode()
+    response = await client.post(f"/api/v1/plans/{plan_id}/import", params={"kind": kind},
+                                 files={"file": ("records.ndjson", body, "application/x-ndjson")})
+    response.raise_for_status()
+
+
+async def grow_plan(client: httpx.AsyncClient, plan_id: str, lists: int, tasks_per_list: int):
+    """Add task lists, with their tasks, until the plan has lists of them"""
+    response = await client.get(f"/api/v1/plans/{plan_id}/task-lists/stream")
+    response.raise_for_status()
+    existing = len(response.json())
+    if lists <= existing:
+        return
+
+    await import_ndjson(client, plan_id, "task_lists", [
+        {"title": f"List {n}", "description": ""} for n in range(existing, lists)])
+    response = await client.get(f"/api/v1/plans/{plan_id}/task-lists/stream")
+    response.raise_for_status()
+    new_lists = [task_list["_id"] for task_list in response.json()][:lists - existing]
+    await import_ndjson(client, plan_id, "tasks", [
+        {"title": f"Task {n}", "description": "", "task_list_id": task_list_id,
+         "due_date": "2030-01-01T00:00:00", "priority": "LOW"}
+        for task_list_id in new_lists for n in range(tasks_per_list)])
+
+
+async def main(base_url: str, list_counts: list, tasks_per_list: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        response = await client.post("/api/v1/auth/register", json={
+            "username": "round-trips", "email": f"round-trips-{uuid.uuid4().hex[:12]}@example.com",
+            "password": uuid.uuid4().hex})
+        response.raise_for_status()
+        response = await client.post("/api/v1/plans/", json={
+            "title": "Round trips", "description": "", "user_id": response.json()["_id"]})
+        response.raise_for_status()
+        plan_id = response.json()["_id"]
+
+        results = []
+        for lists in sorted(list_counts):
+            await grow_plan(client, plan_id, lists, tasks_per_list)
+            row = {"lists": lists, "tasks": lists * tasks_per_list}
+            for name, (route, path) in BOARD_ROUTES.items():
+                before = await command_counts(client, route)
+                response = await client.get(path.format(plan_id=plan_id))
+                response.raise_for_status()
+                issued = await command_counts(client, route) - before
+                row[name] = {"queries": sum(count for command, count in issued.items() if command != "getMore"),
+                             "getMore": issued["getMore"], "by_command": dict(issued)}
+            results.append(row)
+
+        await client.delete(f"/api/v1/plans/{plan_id}")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count Mongo commands per board read")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--lists", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--tasks-per-list", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.base_url, args.lists, args.tasks_per_list))
@@ -0,0 +1,13 @@
+import math
+
+
+def percentiles(samples: list, points: tuple = (50, 95, 99)) -> dict:
+    """Nearest-rank percentiles of latencies in seconds, reported in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    summary = {"count": len(ordered)}
+    for point in points:
+        rank = max(1, math.ceil(point / 100 * len(ordered)))
+        summary[f"p{point}_ms"] = round(ordered[rank - 1] * 1000, 2)
+    return summary
@@ -0,0 +1,82 @@
+"""Latency of an unrelated endpoint during a burst of logins
+
+Registers a throwaway user, measures the probe endpoint on its own, then
+again while --logins logins run concurrently, and prints the percentiles of
+both phases with the login status codes. With password hashing on the event
+loop the probe's p99 grows with the burst. With the hashing pool it stays
+near the baseline, and logins past password_hash_max_pending get a 503 with
+Retry-After.
+
+Usage: python -m backend.benchmarks.login_burst [--base-url http://localhost:8000] [--logins 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter
+import httpx
+from .common import percentiles
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def measure(client: httpx.AsyncClient, path: str, interval: float, during) -> list:
+    """Probe path until the during coroutine finishes, returns the probe latencies and its result"""
+    stop = asyncio.Event()
+    probing = asyncio.create_task(probe(client, path, stop, interval))
+    try:
+        result = await during
+    finally:
+        stop.set()
+    return await probing, result
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> tuple:
+    response = await client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    return response.status_code, response.headers.get("Retry-After")
+
+
+async def main(base_url: str, logins: int, probe_path: str, baseline_seconds: float, interval: float):
+    limits = httpx.Limits(max_connections=logins + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        email, password = f"load-{uuid.uuid4().hex[:12]}@example.com", uuid.uuid4().hex
+        response = await client.post("/api/v1/auth/register", json={
+            "username": "load-test", "email": email, "password": password})
+        response.raise_for_status()
+
+        baseline, _ = await measure(client, probe_path, interval, asyncio.sleep(baseline_seconds))
+        started = time.perf_counter()
+        during_burst, results = await measure(client, probe_path, interval, asyncio.gather(
+            *(login(client, email, password) for _ in range(logins))))
+        burst_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "probe": probe_path,
+        "baseline": percentiles(baseline),
+        "during_burst": percentiles(during_burst),
+        "logins": logins,
+        "burst_seconds": round(burst_seconds, 2),
+        "login_statuses": dict(Counter(status for status, _ in results)),
+        "retry_after_sent": sum(1 for status, retry_after in results if status == 503 and retry_after),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Probe latency during a login burst")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probe", default="/api/v1/metrics/")
+    parser.add_argument("--baseline-seconds", type=float, default=3)
+    parser.add_argument("--interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.base_url, args.logins, args.probe, args.baseline_seconds, args.interval))
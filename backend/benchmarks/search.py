@@ -0,0 +1,99 @@
+"""Search backends against the unanchored case-insensitive regex they replace
+
+Seeds --tasks task titles into a scratch collection, then runs the same
+searches through each search_filter backend and through the in-process
+inverted index, and prints the latency percentiles with the documents each
+Mongo query examined. The regex backend examines every document, prefix
+and text only the matching index entries.
+
+Usage: python -m backend.benchmarks.search [--mongo-uri mongodb://localhost:27017] [--tasks 100000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, TEXT
+from ..db.search import search_filter, lowercase_field
+from ..services.search_index import PlanIndex, tokenize
+from .common import percentiles
+
+WORDS = ["garden", "kitchen", "invoice", "release", "meeting", "backup", "review", "design",
+         "budget", "travel", "garage", "launch", "report", "hiring", "refactor", "deploy"]
+SEARCHES = ["gar", "release", "invoice review", "deploy"]
+
+
+def make_title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(3)) + f" {rng.randrange(10000)}"
+
+
+async def time_query(collection, query: dict, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await collection.find(query, {"title": 1}).limit(10).to_list(length=None)
+        latencies.append(time.perf_counter() - started)
+    explain = await collection.find(query).limit(10).explain()
+    examined = explain.get("executionStats", {}).get("totalDocsExamined")
+    return latencies, examined
+
+
+async def main(mongo_uri: str, database: str, tasks: int, tasks_per_plan: int, repeat: int):
+    rng = random.Random(0)
+    client = AsyncIOMotorClient(mongo_uri)
+    collection = client[database]["search_benchmark"]
+    await collection.drop()
+
+    docs = []
+    for i in range(tasks):
+        title = make_title(rng)
+        docs.append({"title": title, lowercase_field("title"): title.lower(), "plan": i // tasks_per_plan})
+    for start in range(0, len(docs), 10000):
+        await collection.insert_many(docs[start:start + 10000])
+    await collection.create_index([("title", TEXT)])
+    await collection.create_index([(lowercase_field("title"), ASCENDING)])
+
+    results = {}
+    for backend in ("regex", "prefix", "text"):
+        latencies, examined = [], 0
+        for search in SEARCHES:
+            search_latencies, search_examined = await time_query(
+                collection, search_filter("title", search, backend=backend), repeat)
+            latencies.extend(search_latencies)
+            examined = max(examined, search_examined or 0)
+        results[backend] = {**percentiles(latencies), "max_docs_examined": examined}
+
+    # The inverted index over the same titles, one PlanIndex per plan as for a user's plans
+    entries_by_plan = {}
+    for doc in docs:
+        entries_by_plan.setdefault(doc["plan"], []).append(
+            {"type": "task", "id": str(doc["_id"]), "title": doc["title"]})
+    started = time.perf_counter()
+    plan_indexes = [PlanIndex(0, entries) for entries in entries_by_plan.values()]
+    build_seconds = time.perf_counter() - started
+    latencies = []
+    for search in SEARCHES:
+        terms = tokenize(search)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hits = [hit for plan_index in plan_indexes for hit in plan_index.search(terms)]
+            hits.sort(key=lambda hit: (-hit[0], hit[1]["title"].lower()))
+            latencies.append(time.perf_counter() - started)
+    results["inverted_index"] = {**percentiles(latencies), "build_ms": round(build_seconds * 1000, 2)}
+
+    await collection.drop()
+    print(json.dumps({"tasks": tasks, "tasks_per_plan": tasks_per_plan, "searches": SEARCHES,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the search backends")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="search_benchmark")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--tasks-per-plan", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.mongo_uri, args.database, args.tasks, args.tasks_per_plan, args.repeat))
@@ -0,0 +1,83 @@
+"""Time to turn a raw board document into JSON bytes, old path against the encoders
+
+Builds a plan document with --tasks tasks spread over --lists task lists,
+as Motor returns it, and renders it to a response body both ways:
+
+- pydantic: PlanResponseWithAll(**prepare_mongo_document(doc)), then the
+  validation and serialization FastAPI does for response_model
+- encoder: plan_with_all_encoder.encode(doc) rendered by JSONResponse
+
+and prints the percentiles of each, checking both give the same JSON.
+
+Usage: python -m backend.benchmarks.serialization [--tasks 10000] [--lists 20] [--repeat 20]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from ..schemas.common import prepare_mongo_document
+from ..schemas.encoders import plan_with_all_encoder
+from ..schemas.plan import PlanResponseWithAll
+from .common import percentiles
+
+
+def make_board(tasks: int, lists: int) -> dict:
+    now = datetime.utcnow()
+    plan_id = ObjectId()
+    task_lists = []
+    for n in range(lists):
+        task_list_id = ObjectId()
+        task_lists.append({
+            "_id": task_list_id, "title": f"List {n}", "description": "", "plan_id": plan_id,
+            "created_at": now, "updated_at": now,
+            "tasks": [{"_id": ObjectId(), "title": f"Task {i}", "description": "Something to do",
+                       "task_list_id": task_list_id, "due_date": now + timedelta(days=i % 30),
+                       "sort_number": i, "sort_key": None, "priority": "LOW", "status": "OPEN",
+                       "created_at": now, "updated_at": now}
+                      for i in range(n, tasks, lists)],
+        })
+    return {"_id": plan_id, "title": "Board", "description": "", "user_id": ObjectId(), "version": 1,
+            "created_at": now, "updated_at": now, "task_lists": task_lists}
+
+
+def render_pydantic(doc: dict, adapter: TypeAdapter) -> bytes:
+    # What the routes used to do, then FastAPI's serialize_response for response_model
+    model = PlanResponseWithAll(**prepare_mongo_document(doc))
+    content = adapter.dump_python(adapter.validate_python(model), mode="json", by_alias=True)
+    return JSONResponse(content).body
+
+
+def render_encoder(doc: dict) -> bytes:
+    return JSONResponse(plan_with_all_encoder.encode(doc)).body
+
+
+def main(tasks: int, lists: int, repeat: int):
+    doc = make_board(tasks, lists)
+    adapter = TypeAdapter(PlanResponseWithAll)
+    paths = {"pydantic": lambda: render_pydantic(doc, adapter), "encoder": lambda: render_encoder(doc)}
+
+    bodies = {name: json.loads(render()) for name, render in paths.items()}
+    results = {"same_json": bodies["pydantic"] == bodies["encoder"]}
+    for name, render in paths.items():
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            latencies.append(time.perf_counter() - started)
+        results[name] = percentiles(latencies, points=(50, 99))
+    results["speedup_p50"] = round(results["pydantic"]["p50_ms"] / results["encoder"]["p50_ms"], 1)
+
+    print(json.dumps({"tasks": tasks, "lists": lists, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Board serialization micro-benchmark")
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.tasks, args.lists, args.repeat)
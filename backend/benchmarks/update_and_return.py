@@ -0,0 +1,84 @@
+"""PATCH write path: update_one then find_one against update_and_return
+
+Seeds --docs documents in a scratch collection and updates them one after
+another both ways, each --updates times, with a client of its own whose
+command listener counts the commands sent. Prints the latency percentiles
+and the commands per update of each path. update_and_return is a single
+findAndModify, the old path two commands.
+
+Usage: python -m backend.benchmarks.update_and_return [--mongo-uri mongodb://localhost:27017] [--updates 2000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from ..db.writes import update_and_return
+from .common import percentiles
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def old_path(collection, _id, update: dict):
+    result = await collection.update_one({"_id": _id}, update)
+    if result.matched_count == 0:
+        raise LookupError(_id)
+    return await collection.find_one({"_id": _id})
+
+
+async def new_path(collection, _id, update: dict):
+    return await update_and_return(collection, {"_id": _id}, update, not_found="Not found")
+
+
+async def main(mongo_uri: str, database: str, docs: int, updates: int):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(mongo_uri, event_listeners=[counter])
+    collection = client[database]["update_benchmark"]
+    await collection.drop()
+    result = await collection.insert_many([
+        {"title": f"Task {n}", "description": "", "status": "OPEN", "updated_at": datetime.utcnow()}
+        for n in range(docs)])
+    ids = result.inserted_ids
+
+    results = {}
+    for name, path in (("update_one_then_find_one", old_path), ("update_and_return", new_path)):
+        counter.counts.clear()
+        latencies = []
+        for n in range(updates):
+            update = {"$set": {"title": f"Task {n}", "updated_at": datetime.utcnow()}}
+            started = time.perf_counter()
+            await path(collection, ids[n % len(ids)], update)
+            latencies.append(time.perf_counter() - started)
+        results[name] = {**percentiles(latencies),
+                         "commands_per_update": round(sum(counter.counts.values()) / updates, 2),
+                         "by_command": dict(counter.counts)}
+
+    await collection.drop()
+    client.close()
+    print(json.dumps({"docs": docs, "updates": updates, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the PATCH write paths")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="update_benchmark")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.mongo_uri, args.database, args.docs, args.updates))
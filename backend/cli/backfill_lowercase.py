@@ -0,0 +1,27 @@
+"""Store the lowercase copies of searched fields on documents written before they existed
+
+The prefix search backend only finds documents that have them. Safe to run
+again, documents that already have their copy are skipped.
+
+Usage: python -m backend.cli.backfill_lowercase
+"""
+import asyncio
+import json
+from ..db.mongo import db
+from ..db.indexes import SEARCH_FIELDS
+from ..db.search import lowercase_field
+
+
+async def main():
+    counts = {}
+    for collection_name, field in SEARCH_FIELDS.items():
+        copy = lowercase_field(field)
+        result = await db.get_collection(collection_name).update_many(
+            {copy: {"$exists": False}, field: {"$type": "string"}},
+            [{"$set": {copy: {"$toLower": f"${field}"}}}])
+        counts[collection_name] = result.modified_count
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+"""Bulk import tasks or task lists from an NDJSON or CSV file
+
+Usage: python -m backend.cli.import_data tasks.ndjson --kind tasks [--chunk-size 1000]
+"""
+import argparse
+import asyncio
+import json
+from ..services.importer import ImportService, IMPORT_KINDS, read_records
+
+
+async def main(path: str, kind: str, file_format: str, chunk_size: int, plan_id: str):
+    defaults = {"plan_id": plan_id} if plan_id else None
+    with open(path, encoding="utf-8", newline="") as lines:
+        result = await ImportService.import_records(
+            kind, read_records(lines, file_format), chunk_size=chunk_size, defaults=defaults)
+
+    for error in result.pop("errors"):
+        print(json.dumps(error, default=str))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import tasks or task lists")
+    parser.add_argument("path")
+    parser.add_argument("--kind", choices=list(IMPORT_KINDS), default="tasks")
+    parser.add_argument("--format", dest="file_format", choices=["ndjson", "csv"])
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--plan-id", help="plan_id for task lists that don't set one")
+    args = parser.parse_args()
+
+    file_format = args.file_format or (
+        "csv" if args.path.lower().endswith(".csv") else "ndjson")
+    asyncio.run(main(args.path, args.kind, file_format,
+                args.chunk_size, args.plan_id))
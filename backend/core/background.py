@@ -0,0 +1,22 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keeps a reference to running tasks so they aren't garbage collected
+_tasks = set()
+
+
+def _on_done(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error("Background task %s failed", task.get_name(),
+                     exc_info=task.exception())
+
+
+def spawn(coro, name: str = None) -> asyncio.Task:
+    """Run a coroutine in the background of the current event loop, logging failures"""
+    task = asyncio.get_running_loop().create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
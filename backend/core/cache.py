@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from . import metrics
+
+cache_requests = metrics.counter(
+    "cache_requests_total", "In-process cache lookups by cache and result: hit or miss", ("cache", "result"))
+cache_entries = metrics.gauge(
+    "cache_entries", "Entries held by an in-process cache, expired ones included until read", ("cache",))
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a TTL
+
+    maxsize: int -> Least recently used entries are evicted past this size
+    ttl: float -> Default lifetime of an entry in seconds
+    name: str -> Label of the cache in cache_requests_total and cache_entries,
+        a cache without one is not exported
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries = OrderedDict()  # key -> (expires at, value)
+
+    def _count(self, result: str):
+        if self.name:
+            cache_requests.inc(cache=self.name, result=result)
+
+    def _track_size(self):
+        if self.name:
+            cache_entries.set(len(self._entries), cache=self.name)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+                self._track_size()
+            self._count("miss")
+            return default
+
+        self._entries.move_to_end(key)
+        self._count("hit")
+        return entry[1]
+
+    def __contains__(self, key) -> bool:
+        """Whether key holds an unexpired entry, without counting a hit or a miss"""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        self._track_size()
+
+    def delete(self, key):
+        if self._entries.pop(key, None) is not None:
+            self._track_size()
+
+    def clear(self):
+        self._entries.clear()
+        self._track_size()
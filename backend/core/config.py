@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -8,6 +9,54 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: str
     VITE_BACKEND_APP_API_URL: str
+    max_tasks_per_plan: int = 1000
+    count_strategy: Literal["exact", "estimated", "cached"] = "exact"
+    count_cache_ttl_seconds: int = 30
+    index_bootstrap: bool = True
+    index_advisor: bool = True
+    search_backend: Literal["text", "prefix", "regex"] = "text"
+    # In-process inverted index over each user's plan and task titles, served at /api/v1/search/
+    search_index_enabled: bool = False
+    search_index_max_plans: int = 10000
+    user_cache_size: int = 1024
+    user_cache_ttl_seconds: int = 60
+    token_cache_size: int = 4096
+    password_hash_executor: Literal["thread", "process"] = "thread"
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 256
+    stream_batch_size: int = 500
+    import_chunk_size: int = 1000
+    sort_key_max_length: int = 32
+    cascade_batch_size: int = 1000
+    soft_delete: bool = False
+    gc_interval_seconds: int = 60
+    gc_batch_size: int = 100
+    gc_pause_seconds: float = 0.1
+    # Pool options left unset keep the value from mongo_uri, or the driver default
+    mongo_max_pool_size: Optional[int] = None
+    mongo_min_pool_size: Optional[int] = None
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_read_preference: Optional[Literal["primary", "primaryPreferred", "secondary",
+                                            "secondaryPreferred", "nearest"]] = None
+    mongo_compressors: Optional[str] = None  # e.g. "zstd,snappy,zlib"
+    mongo_warmup_connections: int = 10
+    metrics_enabled: bool = True
+    command_monitoring: bool = True
+    slow_query_threshold_ms: int = 100
+    # Needs a replica set, change streams are not available on standalone servers
+    change_feed_enabled: bool = False
+    change_feed_buffer_size: int = 10000
+    change_feed_queue_size: int = 1000
+    change_feed_lookup_cache_size: int = 10000
+    task_list_plan_cache_size: int = 10000
+    task_list_plan_cache_ttl_seconds: int = 60
+    response_cache_enabled: bool = True
+    response_cache_size: int = 1024
+    response_cache_ttl_seconds: int = 300
+    # redis shares the cache between workers, without a URL it is kept in process
+    response_cache_backend: Literal["memory", "redis"] = "memory"
+    response_cache_redis_url: Optional[str] = None
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -3,8 +3,8 @@ from fastapi.exceptions import RequestValidationError, HTTPException
 from fastapi.responses import JSONResponse
 
 
-def error_response(detail: str, status_code: int):
-    return JSONResponse(status_code=status_code, content={
+def error_response(detail: str, status_code: int, headers: dict = None):
+    return JSONResponse(status_code=status_code, headers=headers, content={
         "success": False,
         "error": {
             "code": status_code,
@@ -22,4 +22,4 @@ async def request_validation_exception_handler(req: Request, exc: RequestValidat
 
 
 async def http_exception_handler(req: Request, exc: HTTPException):
-    return error_response(detail=exc.detail, status_code=exc.status_code)
+    return error_response(detail=exc.detail, status_code=exc.status_code, headers=exc.headers)
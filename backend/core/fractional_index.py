@@ -0,0 +1,34 @@
+# Ordered by their code points, so keys sort the same in Python and MongoDB
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def key_between(lower: str = None, upper: str = None) -> str:
+    """Return a key that sorts strictly between lower and upper
+
+    None means "no bound" on that side. Keys never end with the lowest digit,
+    so there is always room for another key below any of them.
+    """
+    if lower is not None and upper is not None and lower >= upper:
+        raise ValueError(f"{lower!r} is not lower than {upper!r}")
+    return _midpoint(lower or "", upper)
+
+
+def _midpoint(lower: str, upper: str = None) -> str:
+    if upper is not None:
+        # Keep the prefix both keys share, lower is padded with the lowest digit
+        n = 0
+        while n < len(upper) and (lower[n] if n < len(lower) else DIGITS[0]) == upper[n]:
+            n += 1
+        if n > 0:
+            return upper[:n] + _midpoint(lower[n:], upper[n:])
+
+    lower_digit = DIGITS.index(lower[0]) if lower else 0
+    upper_digit = DIGITS.index(upper[0]) if upper is not None else len(DIGITS)
+
+    if upper_digit - lower_digit > 1:
+        return DIGITS[(lower_digit + upper_digit) // 2]
+
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+
+    return DIGITS[lower_digit] + _midpoint(lower[1:], None)
@@ -1,7 +1,12 @@
 import jwt
+import time
 from fastapi import HTTPException
 from datetime import timedelta, datetime, timezone
 from ..core.config import settings
+from ..core.cache import TTLCache
+
+# token -> decoded payload, kept until the token expires
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=0, name="token")
 
 
 def create_access_token(data: dict) -> str:
@@ -19,9 +24,21 @@ def create_access_token(data: dict) -> str:
 
 
 def decode_token(token: str):
-    """Decode the token"""
+    """Decode the token
+
+    Verified payloads are memoized until their exp, so a repeat token skips
+    the signature check.
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
-        return jwt.decode(jwt=token, key=settings.secret_key, algorithms=[settings.algorithm])
+        payload = jwt.decode(jwt=token, key=settings.secret_key, algorithms=[settings.algorithm])
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token",
                             headers={"WWW-Authenticate": "Bearer"},)
+
+    if "exp" in payload:
+        token_cache.set(token, payload, ttl=payload["exp"] - time.time())
+    return payload
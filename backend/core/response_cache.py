@@ -0,0 +1,234 @@
+import abc
+import asyncio
+import hashlib
+import json
+import math
+import time
+from . import metrics
+from .cache import TTLCache
+from .config import settings
+
+cache_requests = metrics.counter(
+    "response_cache_requests_total", "Response cache lookups by result: hit, miss or coalesced", ("result",))
+
+
+class CacheBackend(abc.ABC):
+    """Storage of a ResponseCache
+
+    Entries are filed under their plan id, so a plan's entries can be dropped
+    without looking at the others. Install one with ResponseCache.set_backend.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str):
+        """The cached body, None on a miss"""
+
+    @abc.abstractmethod
+    async def set(self, plan_id: str, key: str, body: bytes, ttl: float):
+        """Store body under key, filed under plan_id"""
+
+    @abc.abstractmethod
+    async def delete_plan(self, plan_id: str):
+        """Drop every entry filed under plan_id"""
+
+
+class LRUBackend(CacheBackend):
+    """In-process backend, least recently used entries are evicted past maxsize"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.keys_by_plan = {}  # plan id -> keys set under it
+
+    async def get(self, key: str):
+        return self.entries.get(key)
+
+    async def set(self, plan_id: str, key: str, body: bytes, ttl: float):
+        self.entries.set(key, body, ttl=ttl)
+        # Forget the keys evicted or expired since, the set stays as small as the plan's entries
+        keys = {plan_key for plan_key in self.keys_by_plan.get(plan_id, ()) if plan_key in self.entries}
+        keys.add(key)
+        self.keys_by_plan[plan_id] = keys
+
+    async def delete_plan(self, plan_id: str):
+        for key in self.keys_by_plan.pop(plan_id, ()):
+            self.entries.delete(key)
+
+
+class RedisBackend(CacheBackend):
+    """Backend shared by every worker through Redis
+
+    Each plan has a set of its keys, which expires along with the entries
+    set under it, so dropping a plan costs one SMEMBERS and one DEL.
+
+    client: redis.asyncio.Redis or anything with the same get, set, sadd,
+        expire, smembers and delete coroutines, like LocalRedis
+    """
+
+    def __init__(self, client, namespace: str = "response_cache"):
+        self.client = client
+        self.namespace = namespace
+
+    def _plan_keys(self, plan_id: str) -> str:
+        return f"{self.namespace}:plan:{plan_id}"
+
+    async def get(self, key: str):
+        return await self.client.get(f"{self.namespace}:{key}")
+
+    async def set(self, plan_id: str, key: str, body: bytes, ttl: float):
+        seconds = max(1, math.ceil(ttl))
+        plan_keys = self._plan_keys(plan_id)
+        await self.client.set(f"{self.namespace}:{key}", body, ex=seconds)
+        await self.client.sadd(plan_keys, f"{self.namespace}:{key}")
+        await self.client.expire(plan_keys, seconds)
+
+    async def delete_plan(self, plan_id: str):
+        plan_keys = self._plan_keys(plan_id)
+        keys = await self.client.smembers(plan_keys)
+        await self.client.delete(plan_keys, *keys)
+
+
+class LocalRedis:
+    """In-process stand-in for the Redis commands RedisBackend uses
+
+    For tests and for running a single worker without a Redis server.
+    Values come back as bytes, as from a Redis client without
+    decode_responses.
+    """
+
+    def __init__(self):
+        self._values = {}  # key -> (expires at or None, value)
+
+    def _get(self, key: str):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    async def get(self, key: str):
+        return self._get(key)
+
+    async def set(self, key: str, value, ex: int = None):
+        expires_at = time.monotonic() + ex if ex is not None else None
+        self._values[key] = (expires_at, self._bytes(value))
+        return True
+
+    async def sadd(self, key: str, *members) -> int:
+        values = self._get(key)
+        if values is None:
+            values = set()
+            self._values[key] = (None, values)
+        added = {self._bytes(member) for member in members} - values
+        values.update(added)
+        return len(added)
+
+    async def smembers(self, key: str) -> set:
+        return set(self._get(key) or ())
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        value = self._get(key)
+        if value is None:
+            return False
+        self._values[key] = (time.monotonic() + seconds, value)
+        return True
+
+    async def delete(self, *keys) -> int:
+        deleted = 0
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            if self._get(key) is not None:
+                deleted += 1
+            self._values.pop(key, None)
+        return deleted
+
+
+def build_backend() -> CacheBackend:
+    """The backend picked by settings.response_cache_backend"""
+    if settings.response_cache_backend == "redis":
+        if not settings.response_cache_redis_url:
+            return RedisBackend(LocalRedis())
+        # Only needed with a Redis server
+        import redis.asyncio
+        return RedisBackend(redis.asyncio.Redis.from_url(settings.response_cache_redis_url))
+    return LRUBackend(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl_seconds)
+
+
+class ResponseCache:
+    """Caches rendered response bodies of plan reads
+
+    Entries are keyed on (plan id, plan version, query parameters), so a
+    version bump alone makes older entries unreachable, invalidate() also
+    frees them. Concurrent misses on the same key share a single load.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._loading = {}  # key -> future of the body being loaded
+
+    def set_backend(self, backend: CacheBackend):
+        self.backend = backend
+
+    @staticmethod
+    def key(plan_id: str, version: int, params: dict) -> str:
+        params_hash = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{plan_id}:{version}:{params_hash[:32]}"
+
+    async def get_or_load(self, plan_id: str, version: int, params: dict, load) -> bytes:
+        """Cached body of a plan read, calling load() to build it on a miss
+
+        load: async function -> Builds the response body as bytes
+        """
+        if not settings.response_cache_enabled:
+            return await load()
+
+        key = self.key(plan_id, version, params)
+        body = await self.backend.get(key)
+        if body is not None:
+            cache_requests.inc(result="hit")
+            return body
+
+        future = self._loading.get(key)
+        if future is not None:
+            cache_requests.inc(result="coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The request doing the load was cancelled, not this one
+                if not future.cancelled():
+                    raise
+                return await load()
+
+        cache_requests.inc(result="miss")
+        future = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            body = await load()
+            await self.backend.set(str(plan_id), key, body, self.ttl)
+            future.set_result(body)
+            return body
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Marks the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+
+    async def invalidate(self, *plan_ids):
+        if not settings.response_cache_enabled:
+            return
+        for plan_id in plan_ids:
+            await self.backend.delete_plan(str(plan_id))
+
+
+response_cache = ResponseCache(build_backend(), ttl=settings.response_cache_ttl_seconds)
@@ -1,7 +1,17 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException
 from passlib.context import CryptContext
+from ..core.config import settings
+from ..core.timing import timed
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hash_executor = None
+# Bounds the hashing jobs handed to the executor, the rest wait here
+_hash_slots = asyncio.Semaphore(settings.password_hash_workers)
+_hash_pending = 0
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -9,3 +19,45 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def _get_hash_executor():
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.password_hash_executor == "process":
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+    return _hash_executor
+
+
+async def _run_hash_job(fn, *args):
+    """Run a bcrypt job on the hashing pool without blocking the event loop
+
+    At most password_hash_workers jobs run at once and at most
+    password_hash_max_pending wait for a slot, past that the request is
+    rejected with 503 so a login flood can't pile up unbounded.
+    """
+    global _hash_pending
+    if _hash_pending >= settings.password_hash_max_pending:
+        raise HTTPException(status_code=503, detail="Too many authentication requests",
+                            headers={"Retry-After": "1"})
+
+    _hash_pending += 1
+    try:
+        async with _hash_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    with timed("auth"):
+        return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hash_job(get_password_hash, password)
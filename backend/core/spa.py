@@ -0,0 +1,52 @@
+import hashlib
+import logging
+from starlette.responses import Response
+from .etag import etag_matches
+
+logger = logging.getLogger(__name__)
+
+
+class SPAFallback:
+    """Serves the frontend's index.html for GET requests no route matched
+
+    Installed as the router's default app, so it only runs after routing
+    failed, after Starlette's trailing slash redirects, and never for /api
+    paths, which keep their 404. index.html is read once, by load(), and
+    served from memory with a strong ETag.
+
+    index_path: str -> Path of the built index.html
+    not_found: ASGI app -> Handles everything that isn't served index.html
+    """
+
+    def __init__(self, index_path: str, not_found):
+        self.index_path = index_path
+        self.not_found = not_found
+        self.body = None
+        self.etag = None
+
+    def load(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            logger.warning("%s not found, frontend routes will return 404", self.index_path)
+            self.body = self.etag = None
+            return
+
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.body is None or scope["method"] not in ("GET", "HEAD") \
+                or scope["path"].startswith("/api"):
+            await self.not_found(scope, receive, send)
+            return
+
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if_none_match = next((value.decode("latin-1") for name, value in scope["headers"]
+                              if name == b"if-none-match"), None)
+        if if_none_match and etag_matches(if_none_match, self.etag):
+            response = Response(status_code=304, headers=headers)
+        else:
+            response = Response(self.body, media_type="text/html", headers=headers)
+        await response(scope, receive, send)
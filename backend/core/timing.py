@@ -0,0 +1,40 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RequestTimings:
+    """Seconds spent per phase (db, serialization, auth) while handling one request
+
+    Phases that overlap, like concurrent queries, are summed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+
+    def add(self, phase: str, seconds: float):
+        # Also called from the Mongo driver's threads
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+# Set by middlewares.timing.TimingMiddleware for the duration of a request
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+def record(phase: str, seconds: float):
+    """Add time to a phase of the current request, a no-op outside of one"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
@@ -0,0 +1,56 @@
+import json
+import time
+from ..core.config import settings
+
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+# (collection name, filter key) -> (expires at, count)
+_count_cache = {}
+
+
+def _filter_key(query: dict) -> str:
+    return json.dumps(query, sort_keys=True, default=str)
+
+
+def _prune_count_cache(now: float):
+    for key in [key for key, (expires_at, _) in _count_cache.items() if expires_at <= now]:
+        del _count_cache[key]
+    if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+
+
+async def count_documents(collection, query: dict, strategy: str = None) -> int:
+    """Count the documents matching query using the configured count strategy
+
+    exact -> count_documents on every call
+    estimated -> estimated_document_count from collection metadata when the
+        query has no filter, exact otherwise
+    cached -> exact count memoized per (collection, filter) for
+        settings.count_cache_ttl_seconds, dropped by invalidate_counts
+    """
+    strategy = strategy or settings.count_strategy
+
+    if strategy == "estimated" and not query:
+        return await collection.estimated_document_count()
+
+    if strategy == "cached":
+        key = (collection.name, _filter_key(query))
+        now = time.monotonic()
+        cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        count = await collection.count_documents(query)
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            _prune_count_cache(now)
+        _count_cache[key] = (now + settings.count_cache_ttl_seconds, count)
+        return count
+
+    return await collection.count_documents(query)
+
+
+def invalidate_counts(*collections):
+    """Drop the cached counts of the given collections after a write"""
+    names = {collection.name for collection in collections}
+    for key in [key for key in _count_cache if key[0] in names]:
+        del _count_cache[key]
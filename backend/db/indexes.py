@@ -0,0 +1,135 @@
+import logging
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+from ..core.config import settings
+from .mongo import db
+from .pagination import PAGE_SORT
+from .tombstones import not_deleted, DELETED
+from .search import lowercase_field
+
+logger = logging.getLogger(__name__)
+
+# search backend -> index type its search_filter needs on the searched field
+SEARCH_INDEX_TYPES = {"text": TEXT, "prefix": ASCENDING}
+
+# deleted_at is an equality in every query when soft deletes are on, an
+# index key in front of the sort keys then. Without them it would stop
+# the sort keys from being used.
+TOMBSTONE_KEYS = [("deleted_at", ASCENDING)] if settings.soft_delete else []
+
+# collection name -> indexes the service queries rely on
+INDEXES = {
+    "users": [
+        # Soft-deleted users give their email up, see UserService.delete
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel(TOMBSTONE_KEYS + [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "plans": [
+        IndexModel(TOMBSTONE_KEYS + [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING)] + TOMBSTONE_KEYS),
+    ],
+    "task_lists": [
+        IndexModel([("plan_id", ASCENDING)] + TOMBSTONE_KEYS +
+                   [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "tasks": [
+        IndexModel([("task_list_id", ASCENDING), ("sort_number", ASCENDING),
+                    ("sort_key", ASCENDING)]),
+        IndexModel([("task_list_id", ASCENDING), ("created_at", DESCENDING),
+                    ("_id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+}
+
+# collection name -> field searched by the `search` parameter
+SEARCH_FIELDS = {
+    "users": "username",
+    "plans": "title",
+    "task_lists": "title",
+    "tasks": "title",
+}
+
+if settings.search_backend in SEARCH_INDEX_TYPES:
+    for collection_name, field in SEARCH_FIELDS.items():
+        if settings.search_backend == "prefix":
+            field = lowercase_field(field)
+        INDEXES[collection_name].append(
+            IndexModel([(field, SEARCH_INDEX_TYPES[settings.search_backend])]))
+
+# (collection name, filter, sort) of the queries the services issue. The
+# values are placeholders, only the shape matters to the query planner.
+QUERY_SHAPES = [
+    ("users", {"email": "user@example.com", **not_deleted()}, None),
+    ("users", not_deleted(), PAGE_SORT),
+    ("plans", not_deleted(), PAGE_SORT),
+    ("plans", {"user_id": ObjectId(), **not_deleted()}, None),
+    ("task_lists", {"plan_id": ObjectId(), **not_deleted()}, PAGE_SORT),
+    ("task_lists", {"plan_id": {"$in": [ObjectId()]}, **not_deleted()}, None),
+    ("tasks", {}, PAGE_SORT),
+    ("tasks", {"task_list_id": ObjectId()}, PAGE_SORT),
+    ("tasks", {"task_list_id": ObjectId()}, [("sort_number", DESCENDING)]),
+    ("tasks", {"task_list_id": {"$in": [ObjectId()]}},
+     [("sort_number", ASCENDING), ("sort_key", ASCENDING)]),
+]
+
+
+if settings.soft_delete:
+    # Only tombstones, for the garbage collector
+    INDEXES["task_lists"].append(IndexModel([("deleted_at", ASCENDING)], name="deleted_at_tombstones",
+                                            partialFilterExpression=DELETED))
+    QUERY_SHAPES += [
+        ("users", DELETED, None),
+        ("plans", DELETED, None),
+        ("task_lists", DELETED, None),
+    ]
+
+
+def register_query_shape(collection_name: str, query: dict, sort: list = None):
+    """Add a query shape for report_collection_scans to check"""
+    QUERY_SHAPES.append((collection_name, query, sort))
+
+
+async def ensure_indexes(database=db):
+    """Create every index in INDEXES that does not exist yet
+
+    create_index is a no-op for an index that already exists, so this is safe
+    to run on every startup. A failing index is logged and skipped.
+    """
+    for collection_name, indexes in INDEXES.items():
+        collection = database.get_collection(collection_name)
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])
+            except PyMongoError as e:
+                logger.warning("Could not create index %s on %s: %s",
+                               index.document["name"], collection_name, e)
+
+
+def _find_stages(plan: dict, stage: str) -> bool:
+    if plan.get("stage") == stage:
+        return True
+    children = [plan[key] for key in ("inputStage", "queryPlan") if key in plan]
+    children += plan.get("inputStages", [])
+    return any(_find_stages(child, stage) for child in children)
+
+
+async def report_collection_scans(database=db) -> list:
+    """Explain every registered query shape and log the ones that do a COLLSCAN
+
+    Returns the offending (collection name, filter, sort) shapes.
+    """
+    collection_scans = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = database.get_collection(collection_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if _find_stages(winning_plan, "COLLSCAN"):
+            logger.warning("Query on %s with filter %s and sort %s does a COLLSCAN",
+                           collection_name, query, sort)
+            collection_scans.append((collection_name, query, sort))
+
+    return collection_scans
@@ -0,0 +1,73 @@
+import asyncio
+from bson import ObjectId
+from ..core import metrics
+from ..core.background import spawn
+from .mongo import user_collection, plan_collection, task_list_collection
+from .tombstones import not_deleted
+
+batch_sizes = metrics.histogram(
+    "loader_batch_size", "Distinct ids fetched per batched lookup", ("collection",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+lookups = metrics.counter(
+    "loader_lookups_total", "Lookups by id made through the loaders", ("collection",))
+
+
+class BatchLoader:
+    """Gathers the lookups by id made within one event loop tick into a single $in query
+
+    Lookups of the same id share one result, every caller gets its own
+    shallow copy of the document. Pending lookups are kept per event loop,
+    and cleared at the end of each tick.
+
+    query: dict -> Extra filter every document must match
+    projection: dict -> Fields to load
+    """
+
+    def __init__(self, collection, query: dict = None, projection: dict = None):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self._pending = {}  # event loop -> {id: future}
+
+    async def load(self, _id: ObjectId):
+        """The document with this _id, None when there is none"""
+        lookups.inc(collection=self.collection.name)
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = {}
+            # Runs once the callbacks already scheduled for this tick ran
+            loop.call_soon(self._dispatch, loop)
+
+        future = pending.get(_id)
+        if future is None:
+            future = pending[_id] = loop.create_future()
+        # A cancelled caller must not cancel the lookup the others share
+        doc = await asyncio.shield(future)
+        return dict(doc) if doc is not None else None
+
+    def _dispatch(self, loop):
+        batch = self._pending.pop(loop)
+        spawn(self._fetch(batch), name=f"load-{self.collection.name}")
+
+    async def _fetch(self, batch: dict):
+        batch_sizes.observe(len(batch), collection=self.collection.name)
+        try:
+            cursor = self.collection.find({"_id": {"$in": list(batch)}, **self.query}, self.projection)
+            docs = {doc["_id"]: doc async for doc in cursor}
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Marks the exception retrieved when the caller is gone
+                    future.exception()
+            return
+
+        for _id, future in batch.items():
+            if not future.done():
+                future.set_result(docs.get(_id))
+
+
+user_loader = BatchLoader(user_collection, not_deleted())
+plan_loader = BatchLoader(plan_collection, not_deleted())
+task_list_loader = BatchLoader(task_list_collection, not_deleted())
@@ -1,9 +1,41 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from ..core.config import settings
+from .monitoring import pool_monitor, command_monitor
 
-client = AsyncIOMotorClient(settings.mongo_uri)
+# setting -> MongoClient option, only the ones that are set are passed
+POOL_OPTIONS = {
+    "mongo_max_pool_size": "maxPoolSize",
+    "mongo_min_pool_size": "minPoolSize",
+    "mongo_max_idle_time_ms": "maxIdleTimeMS",
+    "mongo_wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "mongo_read_preference": "readPreference",
+    "mongo_compressors": "compressors",
+}
+
+
+def pool_options() -> dict:
+    return {option: getattr(settings, setting) for setting, option in POOL_OPTIONS.items()
+            if getattr(settings, setting) is not None}
+
+
+event_listeners = [pool_monitor]
+if settings.command_monitoring:
+    event_listeners.append(command_monitor)
+
+client = AsyncIOMotorClient(settings.mongo_uri, event_listeners=event_listeners, **pool_options())
 db = client[settings.mongo_db]
 user_collection = db.get_collection("users")
 plan_collection = db.get_collection("plans")
 task_list_collection = db.get_collection("task_lists")
 task_collection = db.get_collection("tasks")
+task_list_counter_collection = db.get_collection("task_list_counters")
+
+
+async def warm_up(connections: int):
+    """Open connections before the first request needs them
+
+    Concurrent pings each check out a connection of their own, so the pool
+    holds that many open connections afterwards.
+    """
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(connections)))
@@ -0,0 +1,168 @@
+import contextvars
+import json
+import logging
+import threading
+from pymongo import monitoring
+from ..core import metrics
+from ..core.config import settings
+from ..core.timing import record
+
+logger = logging.getLogger(__name__)
+
+pool_checkout_wait = metrics.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool", ("address",))
+pool_checkout_failures = metrics.counter(
+    "mongo_pool_checkout_failures_total", "Connection check outs that failed", ("address", "reason"))
+pool_connections_in_use = metrics.gauge(
+    "mongo_pool_connections_in_use", "Connections currently checked out of the pool", ("address",))
+pool_connections_open = metrics.gauge(
+    "mongo_pool_connections_open", "Connections currently open in the pool", ("address",))
+pool_clears = metrics.counter(
+    "mongo_pool_clears_total", "Times the pool was cleared after a network error", ("address",))
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Records pool saturation from pymongo's CMAP events
+
+    A checkout wait that keeps growing, with connections in use pinned at
+    maxPoolSize, means the pool is too small for the load.
+    """
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pool_clears.inc(address=_address(event))
+
+    def pool_closed(self, event):
+        pool_connections_in_use.set(0, address=_address(event))
+        pool_connections_open.set(0, address=_address(event))
+
+    def connection_created(self, event):
+        pool_connections_open.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections_open.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool_checkout_failures.inc(address=_address(event), reason=event.reason)
+        pool_checkout_wait.observe(event.duration, address=_address(event))
+
+    def connection_checked_out(self, event):
+        pool_connections_in_use.inc(address=_address(event))
+        pool_checkout_wait.observe(event.duration, address=_address(event))
+
+    def connection_checked_in(self, event):
+        pool_connections_in_use.dec(address=_address(event))
+
+
+pool_monitor = PoolMonitor()
+
+
+# Route of the request that issued the commands, set by middlewares.monitoring.tag_route.
+# Motor copies the context into its executor threads, so listeners see it.
+current_route = contextvars.ContextVar("current_route", default="-")
+
+command_duration = metrics.histogram(
+    "mongo_command_duration_seconds", "Latency of MongoDB commands", ("collection", "command", "route"))
+command_failures = metrics.counter(
+    "mongo_command_failures_total", "MongoDB commands that failed", ("collection", "command", "route"))
+slow_commands = metrics.counter(
+    "mongo_slow_commands_total", "MongoDB commands slower than slow_query_threshold_ms",
+    ("collection", "command", "route"))
+
+# command name -> where its filter lives in the command document
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def query_shape(value):
+    """Replace every value of a filter with "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(value[0])] if value else []
+    return "?"
+
+
+def command_filter(command_name: str, command: dict):
+    if command_name in FILTER_FIELDS:
+        return command.get(FILTER_FIELDS[command_name])
+    if command_name in ("update", "delete"):
+        statements = command.get(command_name + "s") or [{}]
+        return statements[0].get("q")
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return pipeline[0].get("$match")
+    return None
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Records per collection, command and route latencies, and logs slow commands
+
+    The route tag makes N+1 patterns stand out: a route whose command count
+    grows with the page size instead of staying flat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}  # (request id, connection id) -> (collection, route, command)
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+        with self._lock:
+            self._started[(event.request_id, event.connection_id)] = (collection, current_route.get(), event.command)
+
+    def succeeded(self, event):
+        with self._lock:
+            started = self._started.pop((event.request_id, event.connection_id), None)
+        if started is None:
+            return
+
+        collection, route, command = started
+        seconds = event.duration_micros / 1_000_000
+        command_duration.observe(seconds, collection=collection, command=event.command_name, route=route)
+        record("db", seconds)
+
+        if seconds * 1000 >= settings.slow_query_threshold_ms:
+            slow_commands.inc(collection=collection, command=event.command_name, route=route)
+            shape = query_shape(command_filter(event.command_name, command))
+            logger.warning("Slow %s on %s from %s took %.1f ms, filter %s", event.command_name,
+                           collection, route, seconds * 1000, json.dumps(shape))
+
+    def failed(self, event):
+        with self._lock:
+            started = self._started.pop((event.request_id, event.connection_id), None)
+        if started is None:
+            return
+
+        collection, route, _ = started
+        seconds = event.duration_micros / 1_000_000
+        command_duration.observe(seconds, collection=collection, command=event.command_name, route=route)
+        record("db", seconds)
+        command_failures.inc(collection=collection, command=event.command_name, route=route)
+
+
+command_monitor = CommandMonitor()
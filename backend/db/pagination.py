@@ -0,0 +1,60 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from .counting import count_documents
+
+PAGE_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(doc: dict) -> str:
+    """Encode the (created_at, _id) position of a document as an opaque token"""
+    payload = json.dumps([doc["created_at"].isoformat(), str(doc["_id"])])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token: str):
+    """Decode a token made by encode_cursor back to (created_at, _id)"""
+    try:
+        created_at, _id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(created_at), ObjectId(_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor_query(query: dict, after: str) -> dict:
+    """Narrow query to the documents that come after the cursor in PAGE_SORT order"""
+    created_at, _id = decode_cursor(after)
+    return {"$and": [query, {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": _id}},
+    ]}]}
+
+
+async def paginate(collection, query: dict, limit: int = 10, skip: int = 0, after: str = None):
+    """Fetch one page of documents newest first
+
+    With `after` the page starts right after the cursor position and skip is
+    ignored, so the cost of a page does not depend on how deep it is. Without
+    it the old skip/limit paging is used.
+
+    The total count runs concurrently with the page query.
+
+    Returns (documents, total count, next cursor or None on the last page).
+    """
+    if after:
+        cursor = collection.find(after_cursor_query(query, after))
+    else:
+        cursor = collection.find(query).skip(skip)
+    cursor = cursor.sort(PAGE_SORT).limit(limit)
+
+    total_count, docs = await asyncio.gather(
+        count_documents(collection, query), cursor.to_list(length=limit))
+
+    next_cursor = None
+    if len(docs) == limit and docs[-1].get("created_at"):
+        next_cursor = encode_cursor(docs[-1])
+
+    return docs, total_count, next_cursor
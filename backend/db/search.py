@@ -0,0 +1,32 @@
+import re
+from ..core.config import settings
+
+
+def search_filter(field: str, search: str, backend: str = None) -> dict:
+    """Build the filter matching `search` against `field`
+
+    text -> $text query served by the collection's text index on field
+    prefix -> case-insensitive prefix match on the lowercase copy of field,
+        served by an ascending index on it
+    regex -> case-insensitive substring match, scans the whole collection
+    """
+    backend = backend or settings.search_backend
+
+    if backend == "text":
+        return {"$text": {"$search": search}}
+    if backend == "prefix":
+        # An anchored, case-sensitive regex is turned into index bounds
+        return {lowercase_field(field): {"$regex": f"^{re.escape(search.lower())}"}}
+    return {field: {"$regex": re.escape(search), "$options": "i"}}
+
+
+def lowercase_field(field: str) -> str:
+    """Name of the lowercase copy of field stored next to it"""
+    return f"{field}_lower"
+
+
+def add_lowercase_copy(data: dict, field: str) -> dict:
+    """Set the lowercase copy of field in an update, when the update sets field"""
+    if data.get(field) is not None:
+        data[lowercase_field(field)] = data[field].lower()
+    return data
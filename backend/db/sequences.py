@@ -0,0 +1,100 @@
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from .mongo import task_collection, task_list_counter_collection
+
+# Order of the tasks in a task list. Tasks moved with fractional keys share
+# the sort_number of a neighbour and are ordered inside it by sort_key, tasks
+# without a sort_key come first.
+TASK_ORDER = [("sort_number", 1), ("sort_key", 1)]
+# Reads of a list rebalance_task_list makes while tasks keep moving under it
+REBALANCE_ATTEMPTS = 3
+
+
+async def allocate_sort_numbers(task_list_id: ObjectId, count: int = 1) -> int:
+    """Reserve `count` consecutive sort numbers at the end of a task list
+
+    Returns the first reserved number. The reservation is one atomic $inc on
+    the task list's counter document, so concurrent creates never get the
+    same number. The first time a task list is seen its counter is seeded
+    from its current last task.
+    """
+    counter = await task_list_counter_collection.find_one_and_update(
+        {"_id": task_list_id}, {"$inc": {"next_sort_number": count}},
+        return_document=ReturnDocument.AFTER)
+
+    if counter is None:
+        await _seed_counter(task_list_id)
+        counter = await task_list_counter_collection.find_one_and_update(
+            {"_id": task_list_id}, {"$inc": {"next_sort_number": count}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+
+    return counter["next_sort_number"] - count
+
+
+async def _seed_counter(task_list_id: ObjectId):
+    last_task = await task_collection.find_one(
+        {"task_list_id": task_list_id}, {"sort_number": 1}, sort=[("sort_number", -1)])
+    next_sort_number = last_task["sort_number"] + 1 if last_task else 0
+
+    try:
+        # $max keeps the counter correct if another request seeded it first
+        await task_list_counter_collection.update_one(
+            {"_id": task_list_id}, {"$max": {"next_sort_number": next_sort_number}}, upsert=True)
+    except DuplicateKeyError:
+        pass
+
+
+async def reserve_sort_numbers_below(limits: dict):
+    """Move counters past sort numbers that were written explicitly
+
+    limits: dict -> task list ObjectId -> highest sort_number written to it
+    Counters that don't exist yet are left alone, they are seeded from the
+    tasks themselves on first use.
+    """
+    if limits:
+        await task_list_counter_collection.bulk_write([
+            UpdateOne({"_id": task_list_id}, {"$max": {"next_sort_number": sort_number + 1}})
+            for task_list_id, sort_number in limits.items()
+        ], ordered=False)
+
+
+async def rebalance_task_list(task_list_id: ObjectId) -> int:
+    """Renumber the tasks of a list 0..n-1 in their current order and drop their sort_keys
+
+    Only tasks whose position changed are written, and only if they are still
+    where they were read: a task moved in the meantime keeps its move, and
+    the list is read again and renumbered around it, up to
+    REBALANCE_ATTEMPTS times. Returns the number of tasks rewritten.
+    """
+    rewritten = 0
+    for _ in range(REBALANCE_ATTEMPTS):
+        tasks_cursor = task_collection.find(
+            {"task_list_id": task_list_id}, {"sort_number": 1, "sort_key": 1}).sort(TASK_ORDER + [("_id", 1)])
+
+        bulk_ops = []
+        sort_number = -1
+        async for sort_number, task in _enumerate(tasks_cursor):
+            if task.get("sort_number") != sort_number or task.get("sort_key") is not None:
+                read_position = {"_id": task["_id"], "task_list_id": task_list_id,
+                                 "sort_number": task.get("sort_number"), "sort_key": task.get("sort_key")}
+                bulk_ops.append(UpdateOne(read_position, {"$set": {
+                    "sort_number": sort_number, "sort_key": None, "updated_at": datetime.utcnow()}}))
+
+        if sort_number >= 0:
+            await reserve_sort_numbers_below({task_list_id: sort_number})
+        if not bulk_ops:
+            break
+        result = await task_collection.bulk_write(bulk_ops, ordered=False)
+        rewritten += result.modified_count
+        if result.matched_count == len(bulk_ops):
+            break
+    return rewritten
+
+
+async def _enumerate(cursor):
+    index = 0
+    async for doc in cursor:
+        yield index, doc
+        index += 1
@@ -0,0 +1,23 @@
+import json
+from bson import decode_all
+
+
+async def stream_json_array(collection, query: dict, sort: list, encoder, batch_size: int):
+    """Yield the documents matching query as one JSON array, batch by batch
+
+    Reads raw BSON batches with find_raw_batches and transcodes each batch to
+    a JSON chunk before fetching the next one, so memory use is bounded by
+    batch_size rather than by the size of the result.
+    """
+    cursor = collection.find_raw_batches(query, sort=sort, batch_size=batch_size)
+
+    yield b"["
+    first = True
+    async for batch in cursor:
+        docs = encoder.encode_many(decode_all(batch))
+        if not docs:
+            continue
+        chunk = json.dumps(docs, separators=(",", ":"))[1:-1].encode()
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
@@ -0,0 +1,33 @@
+from ..core.config import settings
+from .mongo import plan_collection, task_list_collection
+
+# Soft-deleted documents carry a deleted_at date until the garbage collector
+# removes them. Documents that were never deleted have no deleted_at at all,
+# which {"deleted_at": None} matches as well.
+NOT_DELETED = {"deleted_at": None}
+DELETED = {"deleted_at": {"$type": "date"}}
+
+
+def not_deleted() -> dict:
+    """The filter hiding tombstones, empty when soft deletes are off
+
+    Without soft deletes there are no tombstones to hide, and an empty filter
+    keeps unfiltered counts on the estimated strategy.
+    """
+    return NOT_DELETED if settings.soft_delete else {}
+
+
+async def plan_is_deleted(plan_id) -> bool:
+    """Whether a plan is tombstoned or gone, always False without soft deletes"""
+    if not settings.soft_delete:
+        return False
+    plan = await plan_collection.find_one({"_id": plan_id, **NOT_DELETED}, {"_id": 1})
+    return plan is None
+
+
+async def task_list_is_deleted(task_list_id) -> bool:
+    """Whether a task list or its plan is tombstoned or gone, always False without soft deletes"""
+    if not settings.soft_delete:
+        return False
+    task_list = await task_list_collection.find_one({"_id": task_list_id, **NOT_DELETED}, {"plan_id": 1})
+    return task_list is None or await plan_is_deleted(task_list["plan_id"])
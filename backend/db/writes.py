@@ -0,0 +1,20 @@
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+
+async def update_and_return(collection, query: dict, update: dict, not_found: str, projection: dict = None,
+                            return_document: ReturnDocument = ReturnDocument.AFTER) -> dict:
+    """Update the document matching query and return it, as updated by default, in one round trip
+
+    Raises a 404 only when no document matched, an update that changes
+    nothing still returns the document.
+
+    not_found: str -> Detail of the 404
+    projection: dict -> Fields to return, or leave out, of the updated document
+    return_document: ReturnDocument -> BEFORE to get the document as it was
+    """
+    doc = await collection.find_one_and_update(query, update, projection=projection,
+                                               return_document=return_document)
+    if doc is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    return doc
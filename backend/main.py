@@ -1,13 +1,54 @@
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from starlette.middleware.cors import CORSMiddleware
-from .routes import user, auth, task_list, task, plan
+from .routes import user, auth, task_list, task, plan, metrics, changes, search
 from .core import exception_handlers
+from .core.config import settings
+from .db import indexes, mongo
+from .services.gc import GarbageCollector
+from .services.change_feed import change_feed
+from .core.background import spawn
+from .core.spa import SPAFallback
+from .middlewares.monitoring import tag_route
+from .middlewares.timing import TimingMiddleware
+from contextlib import asynccontextmanager
+from pymongo.errors import PyMongoError
+import logging
 import os
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    spa_fallback.load()
+
+    try:
+        if settings.index_bootstrap:
+            await indexes.ensure_indexes()
+        if settings.index_advisor:
+            await indexes.report_collection_scans()
+    except PyMongoError as e:
+        logger.warning("Skipping index bootstrap, MongoDB unavailable: %s", e)
+
+    try:
+        if settings.mongo_warmup_connections:
+            await mongo.warm_up(settings.mongo_warmup_connections)
+    except PyMongoError as e:
+        logger.warning("Skipping connection pool warm-up, MongoDB unavailable: %s", e)
+
+    garbage_collector = spawn(GarbageCollector.run(), name="garbage-collector") \
+        if settings.soft_delete else None
+    if settings.change_feed_enabled:
+        change_feed.start()
+    yield
+    change_feed.stop()
+    if garbage_collector:
+        garbage_collector.cancel()
+
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(tag_route)])
 
 # CORS
 app.add_middleware(
@@ -16,14 +57,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+# Request timing, a plain ASGI middleware that wraps everything registered before it
+app.add_middleware(TimingMiddleware)
+
 # --- Register API routes ---
 app.include_router(auth.router)
 app.include_router(user.router)
 app.include_router(task_list.router)
 app.include_router(task.router)
 app.include_router(plan.router)
+app.include_router(changes.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
+if settings.search_index_enabled:
+    app.include_router(search.router)
 
 # --- Register exception handlers ---
 app.add_exception_handler(
@@ -36,16 +86,6 @@ app.add_exception_handler(
 # --- Serve static frontend files ---
 app.mount("/assets", StaticFiles(directory="frontend/dist/assets"), name="assets")
 
-
-# --- Catch-all to serve index.html for frontend routing ---
-@app.middleware("http")
-async def frontend_catch_all(request: Request, call_next):
-    response = await call_next(request)
-
-    # If the request wasn't handled by any route (404) and isn't an API request
-    if response.status_code == 404 and not request.url.path.startswith("/api"):
-        index_path = os.path.join("frontend", "dist", "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-
-    return response
+# --- Serve index.html for frontend routing, when no route matched ---
+spa_fallback = SPAFallback(os.path.join("frontend", "dist", "index.html"), app.router.default)
+app.router.default = spa_fallback
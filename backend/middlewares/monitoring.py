@@ -0,0 +1,13 @@
+from starlette.requests import HTTPConnection
+from ..db.monitoring import current_route
+
+
+async def tag_route(connection: HTTPConnection):
+    """Tag the Mongo commands issued while handling this request with its route
+
+    Registered as an app-wide dependency, it runs in the request's own task,
+    so the tag is visible to the endpoint and everything it awaits.
+    """
+    method = connection.scope.get("method", "WS")
+    route = connection.scope.get("route")
+    current_route.set(f"{method} {route.path}" if route else connection.url.path)
@@ -0,0 +1,59 @@
+import time
+from starlette.datastructures import MutableHeaders
+from ..core import metrics
+from ..core.timing import RequestTimings, current_timings
+
+request_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time to handle a request, until the last body chunk is sent",
+    ("method", "route", "status"))
+request_phase_duration = metrics.histogram(
+    "http_request_phase_seconds", "Time a request spent in db, serialization and auth",
+    ("method", "route", "phase"))
+
+
+def server_timing(total: float, phases: dict) -> str:
+    entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """Times every HTTP request and reports it in a Server-Timing header
+
+    A plain ASGI middleware: the request runs in the same task, so the
+    RequestTimings set here collect what the handlers record. Server-Timing
+    is sent with the response headers, its total is the time to the first
+    byte. The histograms are observed once the whole body is sent, labeled
+    with the route template rather than the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(time.perf_counter() - started, timings.phases))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": route.path if route else "unmatched"}
+            request_duration.observe(time.perf_counter() - started, status=str(status), **labels)
+            for phase, seconds in timings.phases.items():
+                request_phase_duration.observe(seconds, phase=phase, **labels)
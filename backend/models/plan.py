@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional
 from datetime import datetime
 from ..schemas.common import PyObjectId
@@ -8,5 +8,13 @@ class Plan(BaseModel):
     title: str
     description: str
     user_id: PyObjectId
+    # Incremented by every write to the plan, its task lists or its tasks
+    version: int = 0
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def title_lower(self) -> str:
+        # Searched by the prefix search backend
+        return self.title.lower()
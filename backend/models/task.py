@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional
 from datetime import datetime
 from ..schemas.common import PyObjectId
@@ -10,7 +10,14 @@ class Task(BaseModel):
     task_list_id: PyObjectId
     due_date: datetime
     sort_number: int
+    sort_key: Optional[str] = None
     priority: str  # TODO avoid magic string here -> LOW, MEDIUM, HIGH
     status: str  # TODO avoid magic string here -> OPEN, CLOSE
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def title_lower(self) -> str:
+        # Searched by the prefix search backend
+        return self.title.lower()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional
 from datetime import datetime
 from ..schemas.common import PyObjectId
@@ -10,3 +10,9 @@ class TaskList(BaseModel):
     plan_id: PyObjectId
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def title_lower(self) -> str:
+        # Searched by the prefix search backend
+        return self.title.lower()
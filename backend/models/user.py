@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, computed_field, EmailStr
 from typing import Optional
 from datetime import datetime
 
@@ -9,3 +9,9 @@ class User(BaseModel):
     password: str
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def username_lower(self) -> str:
+        # Searched by the prefix search backend
+        return self.username.lower()
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from ..schemas.user import UserResponse, UserCreate, LoginRequest, Token
 from ..schemas.common import prepare_mongo_document
 from ..services.user import UserService
-from ..core.security import verify_password
+from ..core.security import verify_password_async
 from ..core.jwt import create_access_token
 from ..middlewares.auth import get_current_user
 
@@ -18,7 +18,7 @@ async def create_user(user: UserCreate):
 async def create_user(data: LoginRequest):
     user = await UserService.find_with_pass_by_email(data.email)
     print(prepare_mongo_document(user))
-    if not user or not verify_password(data.password, user["password"]):
+    if not user or not await verify_password_async(data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     userData = prepare_mongo_document(user)
     access_token = create_access_token({"user_id": userData["_id"]})
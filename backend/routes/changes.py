@@ -0,0 +1,73 @@
+import asyncio
+from bson.errors import InvalidId
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from ..services.plan import PlanService
+from ..services.change_feed import change_feed, Subscriber
+from ..core.config import settings
+
+router = APIRouter(tags=["Changes"])
+
+# Close codes, 1013 is "try again later", 4410 mirrors the 410 of the polling endpoint
+TRY_AGAIN_LATER = 1013
+POLICY_VIOLATION = 1008
+TOKEN_TOO_OLD = 4410
+
+
+async def _receive_until_disconnect(websocket: WebSocket):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+async def _send_deltas(websocket: WebSocket, subscriber: Subscriber, last_token: str):
+    while not subscriber.dropped:
+        delta = await subscriber.queue.get()
+        # Deltas already replayed from the buffer can be queued as well
+        if last_token is None or delta["token"] > last_token:
+            await websocket.send_json(delta)
+            last_token = delta["token"]
+    await websocket.close(code=TRY_AGAIN_LATER, reason="Too slow, resume from the last token")
+
+
+@router.websocket("/ws/plans/{plan_id}")
+async def follow_plan_changes(websocket: WebSocket, plan_id: str, since: str = None):
+    """Push the task, task list and plan deltas of a plan
+
+    since: str -> Token of the last delta the client has, or the token the
+    polling endpoint returned, the deltas after it are replayed first
+    """
+    if not settings.change_feed_enabled:
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Change feed is disabled")
+        return
+    try:
+        await PlanService.find_document_by_id(plan_id)
+    except (HTTPException, InvalidId):
+        await websocket.close(code=POLICY_VIOLATION, reason="Plan not found")
+        return
+
+    await websocket.accept()
+    subscriber = change_feed.subscribe(plan_id)
+    try:
+        last_token = change_feed.token
+        if since is not None:
+            missed = change_feed.since(plan_id, since)
+            if missed is None:
+                await websocket.close(code=TOKEN_TOO_OLD, reason="Token too old, reload the plan")
+                return
+            for delta in missed:
+                await websocket.send_json(delta)
+            last_token = max([since] + [delta["token"] for delta in missed])
+
+        tasks = [asyncio.create_task(_receive_until_disconnect(websocket)),
+                 asyncio.create_task(_send_deltas(websocket, subscriber, last_token))]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        change_feed.unsubscribe(subscriber)
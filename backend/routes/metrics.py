@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from ..core.metrics import registry, Histogram
+from ..middlewares.auth import get_current_user
+from ..middlewares.timing import request_duration, request_phase_duration
+
+router = APIRouter(prefix="/api/v1/metrics", tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _summary(series: dict) -> dict:
+    return {
+        "count": series["count"],
+        "mean_ms": round(series["sum"] / series["count"] * 1000, 2) if series["count"] else 0,
+        "p50_ms": round(Histogram.quantile(series, 0.5) * 1000, 2),
+        "p95_ms": round(Histogram.quantile(series, 0.95) * 1000, 2),
+        "p99_ms": round(Histogram.quantile(series, 0.99) * 1000, 2),
+    }
+
+
+@router.get("/", response_class=PlainTextResponse, name="Prometheus metrics")
+async def find_metrics():
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/routes", name="Get request latencies per route")
+async def find_route_latencies(user=Depends(get_current_user)):
+    """Latency summary per route and status, with the mean time of each phase
+
+    Quantiles are estimated from the histogram buckets.
+    """
+    routes = {}
+    for (method, route, status), series in request_duration.snapshot().items():
+        entry = routes.setdefault(f"{method} {route}", {"statuses": {}, "phases": {}})
+        entry["statuses"][status] = _summary(series)
+    for (method, route, phase), series in request_phase_duration.snapshot().items():
+        entry = routes.setdefault(f"{method} {route}", {"statuses": {}, "phases": {}})
+        entry["phases"][phase] = _summary(series)
+    return routes
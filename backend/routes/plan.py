@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, UploadFile, HTTPException, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from ..schemas.plan import PlanResponse, PlanCreate, PlanUpdate, PlanPaginationResponse, PlanResponseWithTaskLists
+from ..schemas.encoders import plan_encoder, plan_with_all_encoder, document_response, page_response
 from ..services.plan import PlanService
 from ..services.task_list import TaskListService
-from typing import Union
-from ..schemas.common import convert_object_ids, prepare_mongo_document
+from ..services.export import ExportService
+from ..services.cascade import CascadeDeleteService
+from ..services.importer import ImportService, read_records
+from ..services.change_feed import change_feed
+from typing import Literal, Union
+import io
+from ..core.config import settings
+from ..core.etag import make_etag, etag_matches, not_modified
+from ..core.response_cache import response_cache
 
 
 router = APIRouter(prefix="/api/v1/plans", tags=["Plans"])
@@ -17,38 +27,90 @@ async def create_plan(plan: PlanCreate):
 @router.get("/", response_model=PlanPaginationResponse, name="Get all plans")
 async def find_all_plans(limit: int = Query(10, ge=1, le=100),
                          skip: int = Query(0, ge=0),
-                         search: str = "", include_all: bool = False):
-    plans = await PlanService.find_all(limit=limit, skip=skip, search=search)
+                         search: str = "", include_all: bool = False, after: str = None):
+    plans = await PlanService.find_all(limit=limit, skip=skip, search=search, after=after)
 
     if include_all:
-        plans_with_all = []
+        boards = await TaskListService.find_all_with_tasks_for_plans(
+            [plan["_id"] for plan in plans["data"]], max_tasks_per_plan=settings.max_tasks_per_plan)
         for plan in plans["data"]:
-            task_list_with_tasks = await TaskListService.find_all_with_tasks(plan_id=str(plan.id))
-            plan_obj = plan.model_dump(by_alias=True)  # Convert to dict
-            plan_obj["task_lists"] = task_list_with_tasks
-            plans_with_all.append(plan_obj)
-        return {
-            "data": prepare_mongo_document(plans_with_all),
-            "count": plans["count"]
-        }
+            plan.update(boards[str(plan["_id"])])
+        return page_response(plan_with_all_encoder, plans)
     else:
-        return plans
+        return page_response(plan_encoder, plans)
+
+
+@router.get("/delete-jobs/{job_id}", name="Get plan delete job progress")
+async def find_plan_delete_job(job_id: str):
+    job = CascadeDeleteService.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Delete job not found")
+    return job
 
 
 @router.get("/{plan_id}", response_model=Union[PlanResponseWithTaskLists, PlanResponse], name="Get plan by id with task lists")
-async def find_plan_by_id_with_task_lists(plan_id: str, include_all: bool = False):
-    plan = await PlanService.find_by_id(plan_id)
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
+async def find_plan_by_id_with_task_lists(plan_id: str, include_all: bool = False,
+                                          if_none_match: str = Header(None)):
+    plan = await PlanService.find_document_by_id(plan_id)
+    etag = make_etag("plan", plan_id, plan.get("version", 0), include_all)
+    # Answered from the plan alone, before the task lists and tasks are read
+    if if_none_match and etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    if include_all:
-        task_list_with_tasks = await TaskListService.find_all_with_tasks(plan_id=str(plan.id))
-        plan_obj = plan.model_dump(by_alias=True)
-        plan_obj["task_lists"] = task_list_with_tasks
+    if not include_all:
+        response = document_response(plan_encoder, plan)
+        response.headers["ETag"] = etag
+        return response
 
-        return PlanResponseWithTaskLists(**prepare_mongo_document(plan_obj))
-    else:
-        return plan
+    async def load():
+        plan["task_lists"] = await TaskListService.find_all_with_tasks(plan_id=plan_id)
+        return document_response(plan_with_all_encoder, plan).body
+
+    body = await response_cache.get_or_load(plan_id, plan.get("version", 0), {"route": "plan", "include_all": True}, load)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/{plan_id}/export", name="Export plan as NDJSON")
+async def export_plan(plan_id: str, checkpoint: str = None):
+    plan = await PlanService.find_document_by_id(plan_id)
+    return StreamingResponse(ExportService.export_plan(plan, checkpoint), media_type="application/x-ndjson")
+
+
+@router.get("/{plan_id}/changes", name="Get plan changes since a token")
+async def find_plan_changes(plan_id: str, since: str = None):
+    """Polling fallback of /ws/plans/{plan_id}
+
+    Without since, only returns the current token to start from. A 410 means
+    the deltas after since are gone, or this worker can't tell, and the plan
+    has to be reloaded.
+    """
+    if not settings.change_feed_enabled:
+        raise HTTPException(status_code=503, detail="Change feed is disabled")
+    await PlanService.find_document_by_id(plan_id)
+
+    token = change_feed.token
+    if token is None:
+        raise HTTPException(status_code=503, detail="Change feed is starting",
+                            headers={"Retry-After": "1"})
+    if since is None:
+        return {"data": [], "token": token}
+    deltas = change_feed.since(plan_id, since)
+    if deltas is None:
+        raise HTTPException(status_code=410, detail="Token too old, reload the plan")
+    # A token from a worker further along stays the client's position
+    return {"data": deltas, "token": max(since, token)}
+
+
+@router.post("/{plan_id}/import", name="Bulk import tasks or task lists")
+async def import_into_plan(plan_id: str, file: UploadFile, kind: Literal["tasks", "task_lists"] = "tasks",
+                           chunk_size: int = Query(None, ge=1, le=10000)):
+    await PlanService.find_document_by_id(plan_id)
+    is_csv = file.content_type == "text/csv" or (
+        file.filename or "").lower().endswith(".csv")
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+
+    return await ImportService.import_records(kind, read_records(lines, "csv" if is_csv else "ndjson"),
+                                              chunk_size=chunk_size, plan_id=plan_id)
 
 
 @router.patch("/{plan_id}", response_model=PlanResponse, name="Update plan")
@@ -57,5 +119,8 @@ async def update_plan(plan_id: str, plan: PlanUpdate):
 
 
 @router.delete("/{plan_id}", name="Delete plan")
-async def delete_plan(plan_id: str):
-    return await PlanService.delete(plan_id=plan_id)
+async def delete_plan(plan_id: str, background: bool = False):
+    result = await PlanService.delete(plan_id=plan_id, background=background)
+    if background:
+        return JSONResponse(jsonable_encoder(result), status_code=202)
+    return result
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, Query
+from bson import ObjectId
+from ..middlewares.auth import get_current_user
+from ..services.search_index import search_index
+
+router = APIRouter(prefix="/api/v1/search", tags=["Search"])
+
+
+@router.get("/", name="Search the plans and tasks of the current user")
+async def search_plans_and_tasks(q: str = Query(..., min_length=1),
+                                 limit: int = Query(10, ge=1, le=100),
+                                 skip: int = Query(0, ge=0),
+                                 user=Depends(get_current_user)):
+    return await search_index.search(ObjectId(user.id), q, limit=limit, skip=skip)
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Query
-from ..schemas.task import TaskResponse, TaskCreate, TaskUpdate, TaskPaginationResponse, TaskBulkUpdateRequest
+from fastapi.responses import StreamingResponse
+from typing import List
+from ..schemas.task import TaskResponse, TaskCreate, TaskUpdate, TaskPaginationResponse, TaskBulkUpdateRequest, TaskMoveRequest
 from ..services.task import TaskService
+from ..schemas.encoders import task_encoder, page_response
 
 router = APIRouter(prefix="/api/v1/plans", tags=["Tasks"])
 
@@ -13,8 +16,14 @@ async def create_task(task: TaskCreate):
 @router.get("/{plan_id}/task-lists/{task_list_id}/tasks", response_model=TaskPaginationResponse, name="Get all tasks")
 async def find_all_tasks(task_list_id: str, limit: int = Query(10, ge=1, le=100),
                          skip: int = Query(0, ge=0),
-                         search: str = ""):
-    return await TaskService.find_all(task_list_id=task_list_id, limit=limit, skip=skip, search=search)
+                         search: str = "", after: str = None):
+    tasks = await TaskService.find_all(task_list_id=task_list_id, limit=limit, skip=skip, search=search, after=after)
+    return page_response(task_encoder, tasks)
+
+
+@router.get("/{plan_id}/task-lists/{task_list_id}/tasks/stream", response_model=List[TaskResponse], name="Stream all tasks")
+async def stream_all_tasks(task_list_id: str):
+    return StreamingResponse(await TaskService.stream_all(task_list_id), media_type="application/json")
 
 
 @router.get("/{plan_id}/task-lists/{task_list_id}/tasks/{task_id}", response_model=TaskResponse, name="Get task by id")
@@ -27,6 +36,11 @@ async def update_task(task_id: str, data: TaskUpdate):
     return await TaskService.update(task_id=task_id, data=data)
 
 
+@router.post("/{plan_id}/task-lists/{task_list_id}/tasks/{task_id}/move", response_model=TaskResponse, name="Move the task")
+async def move_task(task_id: str, data: TaskMoveRequest):
+    return await TaskService.move(task_id=task_id, data=data)
+
+
 @router.delete("/{plan_id}/task-lists/{task_list_id}/tasks/{task_id}", name="Delete the task")
 async def delete_task(task_id: str):
     return await TaskService.delete(task_id=task_id)
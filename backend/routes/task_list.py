@@ -1,6 +1,12 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Header
+from fastapi.responses import StreamingResponse, Response
+from typing import List
 from ..schemas.task_list import TaskListResponse, TaskListCreate, TaskListUpdate, TaskListPaginationResponse
 from ..services.task_list import TaskListService
+from ..schemas.encoders import task_list_encoder, task_list_with_tasks_encoder, page_response
+from ..services.plan import PlanService
+from ..core.etag import make_etag, etag_matches, not_modified
+from ..core.response_cache import response_cache
 
 router = APIRouter(prefix="/api/v1/plans", tags=["Task Lists"])
 
@@ -13,8 +19,30 @@ async def create_task_list(task_list: TaskListCreate):
 @router.get("/{plan_id}/task-lists", response_model=TaskListPaginationResponse, name="Get all task lists")
 async def find_all_task_lists(plan_id: str = None,  limit: int = Query(10, ge=1, le=100),
                               skip: int = Query(0, ge=0),
-                              search: str = "", include_tasks: bool = False):
-    return await TaskListService.find_all_with_pagination(plan_id, limit=limit, skip=skip, search=search, include_tasks=include_tasks)
+                              search: str = "", include_tasks: bool = False, after: str = None,
+                              if_none_match: str = Header(None)):
+    async def load():
+        task_lists = await TaskListService.find_all_with_pagination(plan_id, limit=limit, skip=skip, search=search, include_tasks=include_tasks, after=after)
+        return page_response(task_list_with_tasks_encoder if include_tasks else task_list_encoder, task_lists).body
+
+    version = await PlanService.find_version(plan_id)
+    if version is None:
+        return Response(await load(), media_type="application/json")
+
+    etag = make_etag("task_lists", plan_id, version, limit, skip, search, include_tasks, after)
+    # Answered from the plan's version alone, before the task lists and tasks are read
+    if if_none_match and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    params = {"route": "task_lists", "limit": limit, "skip": skip, "search": search,
+              "include_tasks": include_tasks, "after": after}
+    body = await response_cache.get_or_load(plan_id, version, params, load)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/{plan_id}/task-lists/stream", response_model=List[TaskListResponse], name="Stream all task lists")
+async def stream_all_task_lists(plan_id: str):
+    return StreamingResponse(await TaskListService.stream_all(plan_id), media_type="application/json")
 
 
 @router.get("/{plan_id}/task-lists/{task_list_id}", response_model=TaskListResponse, name="Get task list by id")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Query
 from ..schemas.user import UserResponse, UserCreate, UserUpdate, UserPaginationResponse
 from ..services.user import UserService
+from ..schemas.encoders import user_encoder, page_response
 from typing import List
 
 router = APIRouter(prefix="/api/v1/users", tags=["Users"])
@@ -15,8 +16,9 @@ async def create_user(user: UserCreate):
 async def find_all_users(limit: int = Query(10, ge=1, le=100),
                          skip: int = Query(0, ge=0),
                          search: str = "",
-                         email: str = ""):
-    return await UserService.find_all(limit=limit, skip=skip, search=search, email=email)
+                         email: str = "", after: str = None):
+    users = await UserService.find_all(limit=limit, skip=skip, search=search, email=email, after=after)
+    return page_response(user_encoder, users)
 
 
 @router.get("/{user_id}", response_model=UserResponse, name="Get user by id")
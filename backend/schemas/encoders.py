@@ -0,0 +1,99 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Union, get_args, get_origin
+from .plan import PlanResponse, PlanResponseWithAll
+from .task import TaskResponse
+from .task_list import TaskListResponse, TaskListWithTasksResponse
+from .user import UserResponse
+from ..core.timing import timed
+
+
+def _identity(value):
+    return value
+
+
+def _encode_datetime(value: datetime) -> str:
+    # Same format Pydantic uses for datetimes in JSON mode
+    if value.utcoffset() == timedelta(0):
+        return value.replace(tzinfo=None).isoformat() + "Z"
+    return value.isoformat()
+
+
+def _compile(annotation):
+    """Return the function turning a BSON value of this annotation into a JSON value"""
+    origin = get_origin(annotation)
+
+    if origin is Union:
+        # Only Optional[X] is compiled, other unions are passed through as is
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _compile(args[0]) if len(args) == 1 else _identity
+
+    if origin is list:
+        encode_item = _compile(get_args(annotation)[0])
+        if encode_item is _identity:
+            return _identity
+        return lambda values: [encode_item(value) for value in values]
+
+    if isinstance(annotation, type):
+        if issubclass(annotation, ObjectId):
+            return str
+        if issubclass(annotation, datetime):
+            return _encode_datetime
+        if issubclass(annotation, BaseModel):
+            return DocumentEncoder(annotation).encode
+
+    return _identity
+
+
+class DocumentEncoder:
+    """Encode raw Mongo documents straight to the JSON shape of a response schema
+
+    The field conversions are worked out once from the schema, so encoding a
+    document is a single pass over its fields, without prepare_mongo_document
+    and without building and re-validating a Pydantic model.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self._fields = []  # (key, converter, default)
+        for name, field in model.model_fields.items():
+            default = None if field.is_required() else field.get_default(
+                call_default_factory=True)
+            self._fields.append(
+                (field.alias or name, _compile(field.annotation), default))
+
+    def encode(self, doc: dict) -> dict:
+        encoded = {}
+        for key, convert, default in self._fields:
+            value = doc.get(key)
+            encoded[key] = default if value is None else convert(value)
+        return encoded
+
+    def encode_many(self, docs: list) -> list:
+        return [self.encode(doc) for doc in docs]
+
+
+user_encoder = DocumentEncoder(UserResponse)
+plan_encoder = DocumentEncoder(PlanResponse)
+plan_with_all_encoder = DocumentEncoder(PlanResponseWithAll)
+task_list_encoder = DocumentEncoder(TaskListResponse)
+task_list_with_tasks_encoder = DocumentEncoder(TaskListWithTasksResponse)
+task_encoder = DocumentEncoder(TaskResponse)
+
+
+def document_response(encoder: DocumentEncoder, doc: dict, status_code: int = 200) -> JSONResponse:
+    """Response for a single raw document, skips FastAPI's response_model validation"""
+    with timed("serialization"):
+        return JSONResponse(encoder.encode(doc), status_code=status_code)
+
+
+def page_response(encoder: DocumentEncoder, page: dict) -> JSONResponse:
+    """Response for a {"data", "count", "next_cursor"} page of raw documents"""
+    with timed("serialization"):
+        return JSONResponse({
+            "data": encoder.encode_many(page["data"]),
+            "count": page["count"],
+            "next_cursor": page["next_cursor"]
+        })
@@ -51,6 +51,8 @@ class PlanResponseWithAll(BaseModel):
     description: str
     user_id: PyObjectId = Field(alias="user_id")
     task_lists: List[TaskListWithTasksResponse]
+    # True when the plan has more than settings.max_tasks_per_plan tasks and only the first ones are included
+    tasks_truncated: bool = False
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
 
@@ -62,3 +64,4 @@ class PlanResponseWithAll(BaseModel):
 class PlanPaginationResponse(BaseModel):
     data: Union[List[PlanResponse], List[PlanResponseWithAll]]
     count: int
+    next_cursor: Optional[str] = None
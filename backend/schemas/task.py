@@ -34,6 +34,12 @@ class TaskBulkUpdateRequest(BaseModel):
     tasks: List[TaskBulkUpdateItem]
 
 
+class TaskMoveRequest(BaseModel):
+    task_list_id: str
+    after_id: Optional[str] = None
+    before_id: Optional[str] = None
+
+
 class TaskResponse(BaseModel):
     id: PyObjectId = Field(alias="_id")
     title: str
@@ -41,6 +47,7 @@ class TaskResponse(BaseModel):
     task_list_id: PyObjectId = Field(alias="task_list_id")
     due_date: datetime
     sort_number: int
+    sort_key: Optional[str] = None
     priority: str
     status: str
     created_at: Optional[datetime]
@@ -54,3 +61,4 @@ class TaskResponse(BaseModel):
 class TaskPaginationResponse(BaseModel):
     data: List[TaskResponse]
     count: int
+    next_cursor: Optional[str] = None
@@ -49,3 +49,4 @@ class TaskListWithTasksResponse(BaseModel):
 class TaskListPaginationResponse(BaseModel):
     data: Union[List[TaskListResponse], List[TaskListWithTasksResponse]]
     count: int
+    next_cursor: Optional[str] = None
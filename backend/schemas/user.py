@@ -43,3 +43,4 @@ class Token(BaseModel):
 class UserPaginationResponse(BaseModel):
     data: List[UserResponse]
     count: int
+    next_cursor: Optional[str] = None
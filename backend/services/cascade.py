@@ -0,0 +1,121 @@
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from ..db.mongo import client, plan_collection, task_list_collection, task_collection, task_list_counter_collection
+from ..db.counting import invalidate_counts
+from ..core.background import spawn
+from ..core.config import settings
+
+# IllegalOperation, raised by standalone servers for transactions
+TRANSACTIONS_UNSUPPORTED_CODE = 20
+MAX_FINISHED_JOBS = 1000
+
+_transactions_supported = None
+
+
+async def _write_batch(operation):
+    """Run operation(session) inside a transaction when the deployment supports one
+
+    Standalone servers don't, there the operation runs without a session.
+    """
+    global _transactions_supported
+    if _transactions_supported is not False:
+        try:
+            async with await client.start_session() as session:
+                async with session.start_transaction():
+                    result = await operation(session)
+            _transactions_supported = True
+            return result
+        except OperationFailure as e:
+            if e.code != TRANSACTIONS_UNSUPPORTED_CODE:
+                raise
+            _transactions_supported = False
+
+    return await operation(None)
+
+
+async def find_ids(collection, query: dict, limit: int) -> list:
+    cursor = collection.find(query, {"_id": 1}).limit(limit)
+    return [doc["_id"] async for doc in cursor]
+
+
+class CascadeDeleteService:
+    # job id -> progress of a background delete, the oldest finished ones are dropped
+    jobs = OrderedDict()
+
+    @staticmethod
+    async def delete_plan(plan_id: ObjectId, progress: dict = None):
+        """Delete a plan with all its task lists and tasks
+
+        Children are deleted before their parents, in batches of
+        settings.cascade_batch_size _ids, each batch in its own transaction
+        where available. Only _ids are ever loaded, and a delete cut short
+        leaves a plan that can be deleted again rather than orphaned tasks.
+        """
+        progress = progress if progress is not None else CascadeDeleteService._new_progress()
+        batch_size = settings.cascade_batch_size
+
+        while task_list_ids := await find_ids(task_list_collection, {"plan_id": plan_id}, batch_size):
+            await CascadeDeleteService.delete_task_lists(task_list_ids, progress)
+
+        result = await _write_batch(lambda session: plan_collection.delete_one({"_id": plan_id}, session=session))
+        progress["deleted_plans"] += result.deleted_count
+        invalidate_counts(plan_collection)
+        return progress
+
+    @staticmethod
+    async def delete_task_lists(task_list_ids: list, progress: dict = None):
+        """Delete task lists with all their tasks, tasks first, in bounded batches"""
+        progress = progress if progress is not None else CascadeDeleteService._new_progress()
+        batch_size = settings.cascade_batch_size
+
+        while task_ids := await find_ids(task_collection, {"task_list_id": {"$in": task_list_ids}}, batch_size):
+            result = await _write_batch(lambda session: task_collection.delete_many(
+                {"_id": {"$in": task_ids}}, session=session))
+            progress["deleted_tasks"] += result.deleted_count
+
+        async def delete_task_list_batch(session):
+            await task_list_counter_collection.delete_many({"_id": {"$in": task_list_ids}}, session=session)
+            return await task_list_collection.delete_many({"_id": {"$in": task_list_ids}}, session=session)
+
+        result = await _write_batch(delete_task_list_batch)
+        progress["deleted_task_lists"] += result.deleted_count
+        invalidate_counts(task_list_collection, task_collection)
+        return progress
+
+    @staticmethod
+    def start_plan_job(plan_id: ObjectId) -> dict:
+        """Delete a plan in the background, returns the job to poll for progress"""
+        job = {"id": uuid.uuid4().hex, "plan_id": str(plan_id), "status": "running",
+               "started_at": datetime.utcnow(), "finished_at": None, "error": None,
+               **CascadeDeleteService._new_progress()}
+        CascadeDeleteService.jobs[job["id"]] = job
+        spawn(CascadeDeleteService._run_plan_job(job, plan_id),
+              name=f"delete-plan-{plan_id}")
+        return job
+
+    @staticmethod
+    async def _run_plan_job(job: dict, plan_id: ObjectId):
+        try:
+            await CascadeDeleteService.delete_plan(plan_id, progress=job)
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            raise
+        finally:
+            job["finished_at"] = datetime.utcnow()
+            CascadeDeleteService._drop_old_jobs()
+
+    @staticmethod
+    def _drop_old_jobs():
+        finished = [job_id for job_id, job in CascadeDeleteService.jobs.items()
+                    if job["status"] != "running"]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del CascadeDeleteService.jobs[job_id]
+
+    @staticmethod
+    def _new_progress() -> dict:
+        return {"deleted_plans": 0, "deleted_task_lists": 0, "deleted_tasks": 0}
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from pymongo.errors import OperationFailure, PyMongoError
+from ..db.mongo import db, task_list_collection
+from ..core.background import spawn
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..schemas.encoders import plan_encoder, task_list_encoder, task_encoder
+
+logger = logging.getLogger(__name__)
+
+# collection name -> encoder of its documents in deltas
+WATCHED_COLLECTIONS = {
+    "plans": plan_encoder,
+    "task_lists": task_list_encoder,
+    "tasks": task_encoder,
+}
+RETRY_SECONDS = 5
+# ChangeStreamHistoryLost, the resume token fell off the oplog
+HISTORY_LOST_CODE = 286
+# The _data of a resume token, hex encoded
+TOKEN_PATTERN = re.compile(r"[0-9A-Fa-f]+")
+
+
+class Subscriber:
+    """A client following one plan, with a bounded queue of deltas
+
+    A subscriber whose queue fills up is dropped rather than slowing the
+    feed down for everyone, it resumes from its last token.
+    """
+
+    def __init__(self, plan_id: str):
+        self.plan_id = plan_id
+        self.queue = asyncio.Queue(maxsize=settings.change_feed_queue_size)
+        self.dropped = False
+
+    def push(self, delta: dict) -> bool:
+        try:
+            self.queue.put_nowait(delta)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            return False
+
+
+class ChangeFeed:
+    """Fans a single change stream on plans, task lists and tasks out to subscribers
+
+    Every change becomes a delta {"token", "collection", "operation", "id",
+    "document"}, routed to the subscribers of the plan it belongs to.
+    Tokens are the change stream resume tokens, hex strings that sort in
+    cluster order whichever process saw the change, so a client can poll
+    any worker with the token another one gave it. The last
+    settings.change_feed_buffer_size deltas are kept for clients polling
+    with since(). A soft delete is sent as a delete.
+
+    Deletes carry no document, their plan comes from the pre-image where the
+    collection records them, else from the ids seen earlier. A delete whose
+    plan can't be resolved is not sent to anyone.
+    """
+
+    def __init__(self):
+        self.buffer = deque(maxlen=settings.change_feed_buffer_size)  # (plan id, delta)
+        self.subscribers = {}  # plan id -> set of Subscriber
+        # task list id -> plan id, to route task changes
+        self.plan_ids = TTLCache(maxsize=settings.change_feed_lookup_cache_size, ttl=3600,
+                                 name="change_feed_plan_ids")
+        # task id -> task list id, to route task deletes
+        self.task_list_ids = TTLCache(maxsize=settings.change_feed_lookup_cache_size, ttl=3600,
+                                      name="change_feed_task_list_ids")
+        # Deltas before this token may be missing from the buffer
+        self.horizon = None
+        self._resume_token = None
+        self._task = None
+
+    @property
+    def token(self):
+        """Token of the current position of the stream, None before it is opened"""
+        return self._resume_token["_data"] if self._resume_token else None
+
+    def start(self):
+        if self._task is None:
+            self._task = spawn(self._watch(), name="change-feed")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def subscribe(self, plan_id: str) -> Subscriber:
+        subscriber = Subscriber(plan_id)
+        self.subscribers.setdefault(plan_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.plan_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.plan_id]
+
+    def since(self, plan_id: str, token: str):
+        """Deltas of a plan after token, None when the buffer doesn't reach back that far
+
+        A token from before this process opened its stream is too old as
+        well, it can't tell what happened in between, and so is one that
+        isn't a resume token.
+        """
+        if self.horizon is None or not TOKEN_PATTERN.fullmatch(token) or token < self.horizon:
+            return None
+        return [delta for delta_plan_id, delta in self.buffer
+                if delta["token"] > token and delta_plan_id == plan_id]
+
+    async def _record_pre_images(self) -> bool:
+        """Have the server keep pre-images of task lists and tasks, the plans of their deletes
+
+        Needs MongoDB 6.0. Returns whether both collections record them,
+        older servers leave deletes to the ids seen earlier.
+        """
+        enabled = True
+        for collection in ("task_lists", "tasks"):
+            try:
+                await db.command("collMod", collection, changeStreamPreAndPostImages={"enabled": True})
+            except PyMongoError as e:
+                logger.info("No pre-images on %s, deletes are routed from the ids seen: %s", collection, e)
+                enabled = False
+        return enabled
+
+    async def _watch(self):
+        # Servers before 6.0 reject fullDocumentBeforeChange, it is only asked for when recorded
+        options = {"full_document_before_change": "whenAvailable"} if await self._record_pre_images() else {}
+        pipeline = [{"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}}}]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup",
+                                    resume_after=self._resume_token, **options) as stream:
+                    if self._resume_token is None:
+                        # A fresh stream, whatever happened before it is unknown
+                        self.horizon = stream.resume_token["_data"]
+                    self._resume_token = stream.resume_token
+                    while stream.alive:
+                        change = await stream.try_next()
+                        if change is not None:
+                            await self._publish(change)
+                        # Moves on with the server's position even when nothing changed
+                        self._resume_token = stream.resume_token
+            except PyMongoError as e:
+                if isinstance(e, OperationFailure) and e.code == HISTORY_LOST_CODE:
+                    self._resume_token = None
+                logger.warning("Change stream failed, retrying in %s seconds: %s", RETRY_SECONDS, e)
+                await asyncio.sleep(RETRY_SECONDS)
+
+    async def _publish(self, change: dict):
+        operation = change["operationType"]
+        if operation not in ("insert", "update", "replace", "delete"):
+            return
+
+        collection = change["ns"]["coll"]
+        doc_id = change["documentKey"]["_id"]
+        doc = change.get("fullDocument")
+        if doc is None or doc.get("deleted_at"):
+            operation, doc = "delete", None
+
+        plan_id = await self._find_plan_id(collection, doc_id, doc, change.get("fullDocumentBeforeChange"))
+        if plan_id is None:
+            return
+        delta = {
+            "token": change["_id"]["_data"],
+            "collection": collection,
+            "operation": operation,
+            "id": str(doc_id),
+            "document": WATCHED_COLLECTIONS[collection].encode(doc) if doc else None,
+        }
+        if len(self.buffer) == self.buffer.maxlen:
+            self.horizon = self.buffer[0][1]["token"]
+        self.buffer.append((plan_id, delta))
+
+        for subscriber in list(self.subscribers.get(plan_id, ())):
+            if not subscriber.push(delta):
+                self.unsubscribe(subscriber)
+
+    async def _find_plan_id(self, collection: str, doc_id, doc: dict, before: dict = None):
+        if collection == "plans":
+            return str(doc_id)
+
+        if collection == "task_lists":
+            doc = doc or before
+            if doc is None:
+                return self.plan_ids.get(doc_id)
+            self.plan_ids.set(doc_id, str(doc["plan_id"]))
+            return str(doc["plan_id"])
+
+        doc = doc or before
+        if doc is None:
+            task_list_id = self.task_list_ids.get(doc_id)
+        else:
+            task_list_id = doc["task_list_id"]
+            self.task_list_ids.set(doc_id, task_list_id)
+        if task_list_id is None:
+            return None
+
+        plan_id = self.plan_ids.get(task_list_id)
+        if plan_id is None:
+            task_list = await task_list_collection.find_one({"_id": task_list_id}, {"plan_id": 1})
+            if task_list:
+                plan_id = str(task_list["plan_id"])
+                self.plan_ids.set(task_list_id, plan_id)
+        return plan_id
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from ..db.mongo import task_list_collection, task_collection
+from ..db.tombstones import not_deleted
+from ..schemas.encoders import plan_encoder, task_list_encoder, task_encoder
+
+# Served by the (task_list_id, created_at, _id) index walked backwards
+EXPORT_TASK_SORT = [("created_at", 1), ("_id", 1)]
+
+
+def encode_checkpoint(position: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_checkpoint(token: str) -> dict:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if "task_list_id" in position:
+            position["task_list_id"] = ObjectId(position["task_list_id"])
+        if position.get("task"):
+            created_at, task_id = position["task"]
+            position["task"] = (datetime.fromisoformat(created_at), ObjectId(task_id))
+        return position
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid checkpoint")
+
+
+def _record(record_type: str, data: dict, position: dict) -> bytes:
+    record = {"type": record_type, "data": data,
+              "checkpoint": encode_checkpoint(position)}
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+class ExportService:
+    @staticmethod
+    def export_plan(plan: dict, checkpoint: str = None):
+        """Export a plan with its task lists and tasks as NDJSON records
+
+        The plan record comes first, then every task list ordered by _id, each
+        followed by its tasks. Records are read from Mongo cursors as they are
+        written, so memory stays flat whatever the plan size.
+
+        checkpoint: str -> The checkpoint of the last record the client kept,
+        the export resumes with the record after it
+        """
+        position = decode_checkpoint(checkpoint) if checkpoint else None
+        return ExportService._export_records(plan, position)
+
+    @staticmethod
+    async def _export_records(plan: dict, position: dict = None):
+        if position is None:
+            yield _record("plan", plan_encoder.encode(plan), {})
+            position = {}
+
+        resume_task_list_id = position.get("task_list_id")
+        task_list_query = {"plan_id": plan["_id"], **not_deleted()}
+        if resume_task_list_id:
+            task_list_query["_id"] = {"$gte": resume_task_list_id}
+
+        task_list_cursor = task_list_collection.find(task_list_query).sort("_id", 1)
+        async for task_list in task_list_cursor:
+            task_list_position = {"task_list_id": str(task_list["_id"])}
+            task_query = {"task_list_id": task_list["_id"]}
+
+            if task_list["_id"] != resume_task_list_id:
+                yield _record("task_list", task_list_encoder.encode(task_list), task_list_position)
+            elif position.get("task"):
+                created_at, task_id = position["task"]
+                task_query["$or"] = [
+                    {"created_at": {"$gt": created_at}},
+                    {"created_at": created_at, "_id": {"$gt": task_id}},
+                ]
+
+            task_cursor = task_collection.find(task_query).sort(EXPORT_TASK_SORT)
+            async for task in task_cursor:
+                yield _record("task", task_encoder.encode(task), {
+                    **task_list_position,
+                    "task": [task["created_at"].isoformat(), str(task["_id"])],
+                })
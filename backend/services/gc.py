@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from datetime import datetime
+from ..db.mongo import user_collection, plan_collection, task_list_collection
+from ..db.counting import invalidate_counts
+from ..db.tombstones import NOT_DELETED, DELETED
+from ..core.config import settings
+from .cascade import CascadeDeleteService, find_ids
+
+logger = logging.getLogger(__name__)
+
+
+class GarbageCollector:
+    @staticmethod
+    async def sweep() -> dict:
+        """Hard delete one batch of soft-deleted users, plans and task lists
+
+        A deleted user's plans are tombstoned along with the user, and again
+        here for any created in between, then swept like any other deleted
+        plan. Subtrees are removed one at a time with a
+        pause of settings.gc_pause_seconds in between, so the collector never
+        hogs the database.
+
+        Returns how many of each were removed.
+        """
+        batch_size = settings.gc_batch_size
+        pause = settings.gc_pause_seconds
+        swept = {"users": 0, "plans": 0, "task_lists": 0}
+
+        for user_id in await find_ids(user_collection, DELETED, batch_size):
+            await plan_collection.update_many({"user_id": user_id, **NOT_DELETED},
+                                              {"$set": {"deleted_at": datetime.utcnow()}})
+            await user_collection.delete_one({"_id": user_id})
+            swept["users"] += 1
+            await asyncio.sleep(pause)
+
+        for plan_id in await find_ids(plan_collection, DELETED, batch_size):
+            await CascadeDeleteService.delete_plan(plan_id)
+            swept["plans"] += 1
+            await asyncio.sleep(pause)
+
+        for task_list_id in await find_ids(task_list_collection, DELETED, batch_size):
+            await CascadeDeleteService.delete_task_lists([task_list_id])
+            swept["task_lists"] += 1
+            await asyncio.sleep(pause)
+
+        if swept["users"]:
+            invalidate_counts(user_collection, plan_collection)
+        return swept
+
+    @staticmethod
+    async def run():
+        """Sweep forever, back to back while there is a backlog, every gc_interval_seconds otherwise"""
+        while True:
+            try:
+                swept = await GarbageCollector.sweep()
+            except Exception:
+                logger.exception("Garbage collection sweep failed")
+                swept = {}
+
+            if any(swept.values()):
+                logger.info("Garbage collected %s", swept)
+            if any(count >= settings.gc_batch_size for count in swept.values()):
+                continue
+            await asyncio.sleep(settings.gc_interval_seconds)
@@ -0,0 +1,205 @@
+import asyncio
+import csv
+import json
+import time
+from itertools import islice
+from datetime import datetime
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from ..db.mongo import task_list_collection, task_collection
+from ..db.counting import invalidate_counts
+from ..db.tombstones import not_deleted
+from ..db.sequences import allocate_sort_numbers
+from ..schemas.task import TaskCreate
+from ..schemas.task_list import TaskListCreate
+from ..models.task import Task
+from ..models.task_list import TaskList
+from ..core.config import settings
+from .versioning import bump_plans, bump_plans_of_task_lists
+
+IMPORT_KINDS = {
+    "tasks": (TaskCreate, task_collection),
+    "task_lists": (TaskListCreate, task_list_collection),
+}
+
+
+def read_records(lines, file_format: str = "ndjson"):
+    """Yield (line number, record) for every record of an NDJSON or CSV file
+
+    A line that can't be parsed yields the parse error instead of a record.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Empty CSV cells mean "not set", not empty strings
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ("", None)}
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def _validation_error(line_number: int, e: ValidationError) -> dict:
+    return {"line": line_number, "error": e.errors(include_url=False, include_context=False, include_input=False)}
+
+
+def _validate_chunk(model, records, chunk_size: int, defaults: dict = None, plan_id: str = None):
+    """Read and validate the next chunk_size records, blocking, run in a worker thread
+
+    Returns (records read, valid (line number, item) pairs, errors).
+    """
+    read, chunk, errors = 0, [], []
+    for line_number, record in islice(records, chunk_size):
+        read += 1
+        if isinstance(record, Exception):
+            errors.append({"line": line_number, "error": str(record)})
+            continue
+
+        if isinstance(record, dict):
+            if plan_id and record.get("plan_id") not in (None, plan_id):
+                errors.append({"line": line_number, "error": "plan_id is not the plan imported into"})
+                continue
+            record = {**(defaults or {}), **record}
+            if plan_id and model is TaskListCreate:
+                record["plan_id"] = plan_id
+
+        try:
+            chunk.append((line_number, model.model_validate(record)))
+        except ValidationError as e:
+            errors.append(_validation_error(line_number, e))
+    return read, chunk, errors
+
+
+class ImportService:
+    @staticmethod
+    async def import_records(kind: str, records, chunk_size: int = None, defaults: dict = None, plan_id: str = None):
+        """Bulk import tasks or task lists
+
+        records are validated against TaskCreate / TaskListCreate and written
+        with unordered insert_many, chunk_size at a time. Reading and
+        validating a chunk runs in a worker thread, off the event loop. Tasks
+        get their sort_number assigned per task list in memory, after the
+        current last task of the list, reserving each chunk's numbers with one
+        atomic counter update per list.
+
+        records: iterable -> (line number, record dict) pairs, see read_records
+        defaults: dict -> Values used for fields a record leaves out
+        plan_id: str -> Plan the import is scoped to. Task lists are created in
+        it, and tasks must belong to one of its task lists
+
+        Returns the counts, the per-record errors and the throughput.
+        """
+        model, collection = IMPORT_KINDS[kind]
+        chunk_size = chunk_size or settings.import_chunk_size
+        started_at = time.perf_counter()
+        records = iter(records)
+        total, inserted, errors = 0, 0, []
+
+        while True:
+            read, chunk, chunk_errors = await asyncio.to_thread(
+                _validate_chunk, model, records, chunk_size, defaults, plan_id)
+            if not read:
+                break
+            total += read
+            errors.extend(chunk_errors)
+
+            if chunk and plan_id and kind == "tasks":
+                chunk = await ImportService._check_task_lists(chunk, plan_id, errors)
+            if chunk:
+                inserted += await ImportService._insert_chunk(kind, chunk, errors)
+
+        if inserted:
+            invalidate_counts(collection)
+
+        elapsed = time.perf_counter() - started_at
+        return {
+            "total": total,
+            "inserted": inserted,
+            "failed": total - inserted,
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "docs_per_second": round(inserted / elapsed, 1) if elapsed else 0,
+        }
+
+    @staticmethod
+    async def _check_task_lists(chunk: list, plan_id: str, errors: list) -> list:
+        """Keep the tasks of a chunk whose task list is in the plan, with one $in query"""
+        task_list_ids = list({ObjectId(item.task_list_id) for _, item in chunk if ObjectId.is_valid(item.task_list_id)})
+        cursor = task_list_collection.find(
+            {"_id": {"$in": task_list_ids}, "plan_id": ObjectId(plan_id), **not_deleted()}, {"_id": 1})
+        in_plan = {str(task_list["_id"]) async for task_list in cursor}
+
+        kept = []
+        for line_number, item in chunk:
+            if item.task_list_id in in_plan:
+                kept.append((line_number, item))
+            else:
+                errors.append({"line": line_number, "error": "task_list_id is not a task list of the plan"})
+        return kept
+
+    @staticmethod
+    async def _insert_chunk(kind: str, chunk: list, errors: list) -> int:
+        _, collection = IMPORT_KINDS[kind]
+        now = datetime.utcnow()
+        line_numbers, docs = [], []
+
+        if kind == "tasks":
+            next_sort_numbers = await ImportService._reserve_sort_numbers(
+                [item.task_list_id for _, item in chunk])
+
+        for line_number, item in chunk:
+            try:
+                if kind == "tasks":
+                    doc = Task(**item.model_dump(), sort_number=next_sort_numbers.get(item.task_list_id, 0),
+                               created_at=now, updated_at=now).model_dump()
+                    next_sort_numbers[item.task_list_id] = doc["sort_number"] + 1
+                else:
+                    doc = TaskList(**item.model_dump(),
+                                   created_at=now, updated_at=now).model_dump()
+            except ValidationError as e:
+                errors.append(_validation_error(line_number, e))
+                continue
+            line_numbers.append(line_number)
+            docs.append(doc)
+
+        if not docs:
+            return 0
+
+        try:
+            result = await collection.insert_many(docs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                errors.append({"line": line_numbers[write_error["index"]],
+                               "error": write_error.get("errmsg")})
+            inserted = e.details.get("nInserted", 0)
+
+        if inserted and kind == "tasks":
+            await bump_plans_of_task_lists(doc["task_list_id"] for doc in docs)
+        elif inserted:
+            await bump_plans(doc["plan_id"] for doc in docs)
+        return inserted
+
+    @staticmethod
+    async def _reserve_sort_numbers(task_list_ids: list) -> dict:
+        """Reserve a block of sort numbers for each task list of a chunk
+
+        Returns task list id -> first reserved sort number. Invalid ids get 0,
+        they are reported when the task itself fails validation.
+        """
+        counts = {}
+        for task_list_id in task_list_ids:
+            counts[task_list_id] = counts.get(task_list_id, 0) + 1
+
+        next_sort_numbers = {}
+        for task_list_id, count in counts.items():
+            next_sort_numbers[task_list_id] = await allocate_sort_numbers(ObjectId(task_list_id), count) \
+                if ObjectId.is_valid(task_list_id) else 0
+        return next_sort_numbers
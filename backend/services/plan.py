@@ -1,6 +1,15 @@
-from ..db.mongo import plan_collection, task_list_collection, task_collection
+from ..db.mongo import plan_collection
 from ..schemas.plan import PlanCreate, PlanResponse, PlanUpdate
 from ..schemas.common import prepare_mongo_document
+from ..db.pagination import paginate
+from ..db.search import search_filter, add_lowercase_copy
+from ..db.counting import invalidate_counts
+from ..db.tombstones import not_deleted
+from ..db.writes import update_and_return
+from ..db.loader import plan_loader
+from ..core.config import settings
+from .cascade import CascadeDeleteService
+from ..core.response_cache import response_cache
 from ..models.plan import Plan
 from fastapi import HTTPException
 from datetime import datetime
@@ -14,61 +23,74 @@ class PlanService:
                          created_at=datetime.utcnow(), updated_at=datetime.utcnow()).model_dump()
         result = await plan_collection.insert_one(plan_data)
         plan_data["_id"] = result.inserted_id
+        invalidate_counts(plan_collection)
 
         return PlanResponse(**prepare_mongo_document(plan_data))
 
     @staticmethod
-    async def find_all(limit: int = 10, skip: int = 0, search: str = ""):
-        query = {}
+    async def find_all(limit: int = 10, skip: int = 0, search: str = "", after: str = None):
+        query = {**not_deleted()}
 
         if search:
-            query["title"] = {"$regex": search, "$options": "i"}
+            query.update(search_filter("title", search))
 
-        total_count = await plan_collection.count_documents(query)
+        plan_docs, total_count, next_cursor = await paginate(
+            plan_collection, query, limit=limit, skip=skip, after=after)
 
-        plan_cursor = plan_collection.find(query).skip(
-            skip).limit(limit).sort("created_at", -1)
+        return {"data": plan_docs, "count": total_count, "next_cursor": next_cursor}
 
-        plans = [PlanResponse(**prepare_mongo_document(plan)) async for plan in plan_cursor]
+    @staticmethod
+    async def find_document_by_id(plan_id: str):
+        plan = await plan_loader.load(ObjectId(plan_id))
+        if not plan:
+            raise HTTPException(status_code=404, detail="Plan not found")
 
-        return {"data": plans, "count": total_count}
+        return plan
+
+    @staticmethod
+    async def find_version(plan_id: str):
+        """Version of a plan, None when there is no such plan"""
+        if not ObjectId.is_valid(plan_id):
+            return None
+        plan = await plan_collection.find_one({"_id": ObjectId(plan_id), **not_deleted()}, {"version": 1})
+        return plan.get("version", 0) if plan else None
 
     @staticmethod
     async def find_by_id(plan_id: str):
-        plan = await plan_collection.find_one({"_id": ObjectId(plan_id)})
-        if not plan:
-            raise HTTPException(status_code=404, detail="Plan not found")
+        plan = await PlanService.find_document_by_id(plan_id)
 
         return PlanResponse(**prepare_mongo_document(plan))
 
     @staticmethod
     async def update(plan_id: str, data: PlanUpdate):
-        update_data = data.model_dump(exclude_unset=True)
+        update_data = add_lowercase_copy(data.model_dump(exclude_unset=True), "title")
         update_data["updated_at"] = datetime.utcnow()
 
-        result = await plan_collection.update_one({"_id": ObjectId(plan_id)}, {"$set": update_data})
+        plan = await update_and_return(plan_collection, {"_id": ObjectId(plan_id), **not_deleted()},
+                                       {"$set": update_data, "$inc": {"version": 1}}, not_found="Plan not found")
+        await response_cache.invalidate(plan["_id"])
 
-        if result.modified_count == 0:
-            raise HTTPException(
-                status_code=404, detail="Plan not found or no changes")
-        return await PlanService.find_by_id(plan_id)
+        return PlanResponse(**prepare_mongo_document(plan))
 
     @staticmethod
-    async def delete(plan_id: str):
-        # 1. Delete the Plan
-        result = await plan_collection.delete_one({"_id": ObjectId(plan_id)})
-        if result.deleted_count == 0:
+    async def delete(plan_id: str, background: bool = False):
+        if settings.soft_delete:
+            result = await plan_collection.update_one({"_id": ObjectId(plan_id), **not_deleted()},
+                                                      {"$set": {"deleted_at": datetime.utcnow()}})
+            if result.matched_count == 0:
+                raise HTTPException(status_code=404, detail="Plan not found")
+            invalidate_counts(plan_collection)
+            await response_cache.invalidate(plan_id)
+            return {"message": "Plan deleted successfully, its TaskLists and Tasks will be removed shortly"}
+
+        plan = await plan_collection.find_one({"_id": ObjectId(plan_id), **not_deleted()}, {"_id": 1})
+        if not plan:
             raise HTTPException(status_code=404, detail="Plan not found")
 
-        # 2. Find all TaskLists under the Plan
-        task_lists = await task_list_collection.find({"plan_id": ObjectId(plan_id)}).to_list(length=None)
-        task_list_ids = [task_list["_id"] for task_list in task_lists]
-
-        # 3. Delete all Tasks under those TaskLists
-        if task_list_ids:
-            await task_collection.delete_many({"task_list_id": {"$in": task_list_ids}})
+        await response_cache.invalidate(plan["_id"])
+        if background:
+            return CascadeDeleteService.start_plan_job(plan["_id"])
 
-        # 4. Delete all TaskLists under the Plan
-        await task_list_collection.delete_many({"plan_id": ObjectId(plan_id)})
+        await CascadeDeleteService.delete_plan(plan["_id"])
 
         return {"message": "Plan and associated TaskLists and Tasks deleted successfully"}
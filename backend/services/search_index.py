@@ -0,0 +1,128 @@
+import bisect
+import re
+from ..db.mongo import plan_collection, task_list_collection, task_collection
+from ..db.tombstones import not_deleted
+from ..core.cache import TTLCache
+from ..core.config import settings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Score of a query term matching a whole title word, and only the start of one
+WORD_SCORE, PREFIX_SCORE = 2, 1
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class PlanIndex:
+    """Inverted index over the titles of a plan and of its tasks
+
+    entries: list -> Search hits, dicts with "type", "id", "plan_id" and "title"
+    """
+
+    def __init__(self, version: int, entries: list):
+        self.version = version
+        self.entries = entries
+        self.postings = {}  # word -> positions of the entries whose title has it
+        for position, entry in enumerate(entries):
+            for word in set(tokenize(entry["title"])):
+                self.postings.setdefault(word, set()).add(position)
+        self.words = sorted(self.postings)
+
+    def _match(self, term: str) -> dict:
+        """Entry position -> score of the entries with a word starting with term"""
+        scores = {}
+        position = bisect.bisect_left(self.words, term)
+        while position < len(self.words) and self.words[position].startswith(term):
+            word = self.words[position]
+            score = WORD_SCORE if word == term else PREFIX_SCORE
+            for entry_position in self.postings[word]:
+                scores[entry_position] = max(scores.get(entry_position, 0), score)
+            position += 1
+        return scores
+
+    def search(self, terms: list) -> list:
+        """(score, entry) of the entries matching every term"""
+        scores = None
+        for term in terms:
+            term_scores = self._match(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {position: score + term_scores[position]
+                          for position, score in scores.items() if position in term_scores}
+            if not scores:
+                return []
+        return [(score, self.entries[position]) for position, score in scores.items()]
+
+
+class SearchIndex:
+    """In-process inverted index over the plan and task titles of each user
+
+    Plans are indexed one by one and kept with the version they were built
+    at. Every write to a plan, its task lists or its tasks bumps the version,
+    so a search reads the user's plan versions, one query, and only rebuilds
+    the plans that changed, two more queries however many.
+    """
+
+    def __init__(self, maxsize: int):
+        self.plans = TTLCache(maxsize=maxsize, ttl=3600, name="search_index_plans")
+
+    async def _plan_indexes(self, user_id) -> list:
+        plans = await plan_collection.find(
+            {"user_id": user_id, **not_deleted()}, {"title": 1, "version": 1}).to_list(length=None)
+
+        indexes, stale = [], []
+        for plan in plans:
+            plan_index = self.plans.get(plan["_id"])
+            if plan_index is None or plan_index.version != plan.get("version", 0):
+                stale.append(plan)
+            else:
+                indexes.append(plan_index)
+        if stale:
+            indexes.extend(await self._build(stale))
+        return indexes
+
+    async def _build(self, plans: list) -> list:
+        entries_by_plan = {plan["_id"]: [{"type": "plan", "id": str(plan["_id"]), "plan_id": str(plan["_id"]),
+                                          "title": plan["title"]}]
+                           for plan in plans}
+
+        task_lists = await task_list_collection.find(
+            {"plan_id": {"$in": list(entries_by_plan)}, **not_deleted()}, {"plan_id": 1}).to_list(length=None)
+        plan_by_task_list = {task_list["_id"]: task_list["plan_id"] for task_list in task_lists}
+        if plan_by_task_list:
+            tasks_cursor = task_collection.find(
+                {"task_list_id": {"$in": list(plan_by_task_list)}}, {"title": 1, "task_list_id": 1})
+            async for task in tasks_cursor:
+                plan_id = plan_by_task_list[task["task_list_id"]]
+                entries_by_plan[plan_id].append({"type": "task", "id": str(task["_id"]), "plan_id": str(plan_id),
+                                                 "task_list_id": str(task["task_list_id"]), "title": task["title"]})
+
+        indexes = []
+        for plan in plans:
+            plan_index = PlanIndex(plan.get("version", 0), entries_by_plan[plan["_id"]])
+            self.plans.set(plan["_id"], plan_index)
+            indexes.append(plan_index)
+        return indexes
+
+    async def search(self, user_id, query: str, limit: int = 10, skip: int = 0) -> dict:
+        """Plans and tasks of a user whose titles have words starting with every word of query
+
+        Ranked by score, a whole word match counting more than a prefix one,
+        then by title.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return {"data": [], "count": 0}
+
+        hits = []
+        for plan_index in await self._plan_indexes(user_id):
+            hits.extend(plan_index.search(terms))
+        hits.sort(key=lambda hit: (-hit[0], hit[1]["title"].lower(), hit[1]["id"]))
+
+        return {"data": [{**entry, "score": score} for score, entry in hits[skip:skip + limit]],
+                "count": len(hits)}
+
+
+search_index = SearchIndex(maxsize=settings.search_index_max_plans)
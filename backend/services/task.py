@@ -1,33 +1,71 @@
 from ..db.mongo import task_collection
-from ..schemas.task import TaskCreate, TaskResponse, TaskUpdate, TaskBulkUpdateRequest
+from ..schemas.task import TaskCreate, TaskResponse, TaskUpdate, TaskBulkUpdateRequest, TaskMoveRequest
 from ..schemas.common import prepare_mongo_document
+from ..db.pagination import paginate
+from ..db.streaming import stream_json_array
+from ..schemas.encoders import task_encoder
+from ..core.config import settings
+from ..db.search import search_filter, add_lowercase_copy
+from ..db.counting import invalidate_counts
+from ..db.writes import update_and_return
+from ..db.tombstones import task_list_is_deleted
+from ..db.sequences import allocate_sort_numbers, reserve_sort_numbers_below, rebalance_task_list, TASK_ORDER
+from ..core.fractional_index import key_between
+from ..core.background import spawn
 from ..models.task import Task
+from .versioning import bump_plans_of_task_lists
 from fastapi import HTTPException
 from datetime import datetime
 from bson import ObjectId
-from pymongo import UpdateOne
+from pymongo import UpdateOne, ReturnDocument
+
+NEIGHBOUR_PROJECTION = {"task_list_id": 1, "sort_number": 1, "sort_key": 1}
+
+
+def _position_between(after: dict = None, before: dict = None):
+    """Work out the (sort_number, sort_key) of a task placed between two neighbours
+
+    Returns (None, None) when the list is empty, the caller allocates a fresh
+    sort_number then, and None when the neighbours leave no room and the list
+    has to be rebalanced first.
+    """
+    if after is None and before is None:
+        return None, None
+
+    if before is None:
+        return after["sort_number"], key_between(after.get("sort_key"), None)
+
+    if after is None:
+        if before.get("sort_key") is None:
+            return before["sort_number"] - 1, None
+        return before["sort_number"], key_between(None, before["sort_key"])
+
+    if after["sort_number"] < before["sort_number"]:
+        return after["sort_number"], key_between(after.get("sort_key"), None)
+
+    if after["sort_number"] == before["sort_number"] and before.get("sort_key") is not None \
+            and (after.get("sort_key") or "") < before["sort_key"]:
+        return after["sort_number"], key_between(after.get("sort_key"), before["sort_key"])
+
+    return None
 
 
 class TaskService:
     @staticmethod
     async def create(task: TaskCreate):
-        last_task = await task_collection.find_one(
-            {"task_list_id": ObjectId(task.task_list_id)},
-            sort=[("sort_number", -1)]
-        )
-
-        next_sort_number = (last_task.get(
-            "sort_number", 0) + 1) if last_task else 0
+        next_sort_number = await allocate_sort_numbers(ObjectId(task.task_list_id))
 
         task_data = Task(title=task.title, description=task.description, task_list_id=task.task_list_id, priority=task.priority, status=task.status, due_date=task.due_date, sort_number=next_sort_number,
                          created_at=datetime.utcnow(), updated_at=datetime.utcnow()).model_dump()
         result = await task_collection.insert_one(task_data)
         task_data["_id"] = result.inserted_id
+        invalidate_counts(task_collection)
+        await bump_plans_of_task_lists([task_data["task_list_id"]])
 
         return TaskResponse(**prepare_mongo_document(task_data))
 
     @staticmethod
-    async def find_all(task_list_id: str = None, limit: int = 10, skip: int = 0, search: str = ""):
+    async def find_all(task_list_id: str = None, limit: int = 10, skip: int = 0, search: str = "", after: str = None):
         query = {}
 
         if task_list_id:
@@ -36,55 +74,77 @@ class TaskService:
             except Exception:
                 raise HTTPException(
                     status_code=400, detail="Invalid task_list_id")
+            if await task_list_is_deleted(task_list_obj_id):
+                raise HTTPException(status_code=404, detail="Task list not found")
             query = {"task_list_id": task_list_obj_id}
 
         if search:
-            query["title"] = {"$regex": search, "$options": "i"}
+            query.update(search_filter("title", search))
 
-        total_count = await task_collection.count_documents(query)
+        task_docs, total_count, next_cursor = await paginate(
+            task_collection, query, limit=limit, skip=skip, after=after)
 
-        task_cursor = task_collection.find(query).skip(
-            skip).limit(limit).sort("created_at", -1)
+        return {"data": task_docs, "count": total_count, "next_cursor": next_cursor}
 
-        tasks = [TaskResponse(**prepare_mongo_document(task)) async for task in task_cursor]
+    @staticmethod
+    async def stream_all(task_list_id: str):
+        """Stream every task of a task list as JSON, in board order"""
+        try:
+            task_list_obj_id = ObjectId(task_list_id)
+        except Exception:
+            raise HTTPException(
+                status_code=400, detail="Invalid task_list_id")
+        if await task_list_is_deleted(task_list_obj_id):
+            raise HTTPException(status_code=404, detail="Task list not found")
 
-        return {"data": tasks, "count": total_count}
+        return stream_json_array(task_collection, {"task_list_id": task_list_obj_id}, TASK_ORDER,
+                                 task_encoder, batch_size=settings.stream_batch_size)
 
     @staticmethod
     async def find_by_id(task_id: str):
         task = await task_collection.find_one({"_id": ObjectId(task_id)})
-        if not task:
+        if not task or await task_list_is_deleted(task["task_list_id"]):
             raise HTTPException(status_code=404, detail="Task not found")
 
         return TaskResponse(**prepare_mongo_document(task))
 
     @staticmethod
     async def update(task_id: str, data: TaskUpdate):
-        update_data = data.model_dump(exclude_unset=True)
+        update_data = add_lowercase_copy(data.model_dump(exclude_unset=True), "title")
         update_data["updated_at"] = datetime.utcnow()
         if update_data.get("task_list_id"):
             update_data["task_list_id"] = ObjectId(
                 update_data.get("task_list_id"))
 
-        result = await task_collection.update_one({"_id": ObjectId(task_id)}, {"$set": update_data})
+        # The document as it was, to bump the plan a task moves out of as well
+        task = await update_and_return(task_collection, {"_id": ObjectId(task_id)},
+                                       {"$set": update_data}, not_found="Task not found",
+                                       return_document=ReturnDocument.BEFORE)
+        task_list_ids = [task["task_list_id"]]
+        task.update(update_data)
+        task_list_ids.append(task["task_list_id"])
+        if "task_list_id" in update_data:
+            invalidate_counts(task_collection)
+        await bump_plans_of_task_lists(task_list_ids)
 
-        if result.modified_count == 0:
-            raise HTTPException(
-                status_code=404, detail="Task not found or no changes")
-        return await TaskService.find_by_id(task_id)
+        return TaskResponse(**prepare_mongo_document(task))
 
     @staticmethod
     async def delete(task_id: str):
-        result = await task_collection.delete_one({"_id": ObjectId(task_id)})
-        if result.deleted_count == 0:
+        task = await task_collection.find_one_and_delete({"_id": ObjectId(task_id)}, projection={"task_list_id": 1})
+        if not task:
             raise HTTPException(
                 status_code=404, detail="Task not found")
+        invalidate_counts(task_collection)
+        await bump_plans_of_task_lists([task["task_list_id"]])
 
         return {"message": "Task deleted successfully"}
 
     @staticmethod
     async def bulk_update(data: TaskBulkUpdateRequest):
         bulk_ops = []
+        task_ids = []
+        max_sort_numbers = {}
 
         for item in data.tasks:
             try:
@@ -95,6 +155,7 @@ class TaskService:
                             "$set": {
                                 "task_list_id": ObjectId(item.task_list_id),
                                 "sort_number": item.sort_number,
+                                "sort_key": None,
                                 "updated_at": datetime.utcnow(),
                             }
                         }
@@ -103,12 +164,128 @@ class TaskService:
             except Exception as e:
                 raise HTTPException(
                     status_code=400, detail=f"Invalid ID format: {e}")
+            task_ids.append(ObjectId(item.id))
+            task_list_id = ObjectId(item.task_list_id)
+            max_sort_numbers[task_list_id] = max(
+                item.sort_number, max_sort_numbers.get(task_list_id, item.sort_number))
 
         if bulk_ops:
+            # The lists the tasks move out of, their plans change as well
+            previous_cursor = task_collection.find(
+                {"_id": {"$in": task_ids}}, {"task_list_id": 1})
+            task_list_ids = {task["task_list_id"] async for task in previous_cursor}
+
             result = await task_collection.bulk_write(bulk_ops)
+            await reserve_sort_numbers_below(max_sort_numbers)
+            invalidate_counts(task_collection)
+            await bump_plans_of_task_lists(task_list_ids | set(max_sort_numbers))
             return {
                 "matched": result.matched_count,
                 "modified": result.modified_count,
             }
 
         return {"matched": 0, "modified": 0}
+
+    @staticmethod
+    async def move(task_id: str, data: TaskMoveRequest):
+        """Move a task right after `after_id` and/or right before `before_id`
+
+        Only the moved task is written: it takes the sort_number of a
+        neighbour and a fractional sort_key between the neighbours' keys. With
+        no neighbour given the task goes to the end of the list. Once keys get
+        longer than settings.sort_key_max_length the list is renumbered in the
+        background.
+        """
+        try:
+            task_obj_id = ObjectId(task_id)
+            task_list_obj_id = ObjectId(data.task_list_id)
+            after_obj_id = ObjectId(data.after_id) if data.after_id else None
+            before_obj_id = ObjectId(data.before_id) if data.before_id else None
+        except Exception as e:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid ID format: {e}")
+
+        after, before = await TaskService._find_neighbours(
+            task_obj_id, task_list_obj_id, after_obj_id, before_obj_id)
+        position = _position_between(after, before)
+
+        if position is None:
+            await TaskService._rebalance(task_list_obj_id)
+            after, before = await TaskService._find_neighbours(
+                task_obj_id, task_list_obj_id, after_obj_id, before_obj_id)
+            position = _position_between(after, before)
+            if position is None:
+                raise HTTPException(
+                    status_code=400, detail="after_id must come before before_id")
+
+        sort_number, sort_key = position
+        if sort_number is None:
+            sort_number = await allocate_sort_numbers(task_list_obj_id)
+
+        position_data = {"task_list_id": task_list_obj_id, "sort_number": sort_number,
+                         "sort_key": sort_key, "updated_at": datetime.utcnow()}
+        # The document as it was, to bump the plan a task moves out of as well
+        task = await task_collection.find_one_and_update(
+            {"_id": task_obj_id}, {"$set": position_data},
+            return_document=ReturnDocument.BEFORE)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        previous_task_list_id = task["task_list_id"]
+        task.update(position_data)
+        invalidate_counts(task_collection)
+        await bump_plans_of_task_lists([previous_task_list_id, task_list_obj_id])
+
+        if sort_key and len(sort_key) > settings.sort_key_max_length:
+            spawn(TaskService._rebalance(task_list_obj_id),
+                  name=f"rebalance-task-list-{task_list_obj_id}")
+
+        return TaskResponse(**prepare_mongo_document(task))
+
+    @staticmethod
+    async def _rebalance(task_list_id: ObjectId):
+        await rebalance_task_list(task_list_id)
+        await bump_plans_of_task_lists([task_list_id])
+
+    @staticmethod
+    async def _find_neighbours(task_id: ObjectId, task_list_id: ObjectId, after_id: ObjectId = None, before_id: ObjectId = None):
+        """Load the tasks a moved task goes between, looking up the missing side"""
+        neighbour_ids = [_id for _id in (after_id, before_id) if _id]
+        neighbours = {}
+        if neighbour_ids:
+            neighbours_cursor = task_collection.find(
+                {"_id": {"$in": neighbour_ids}}, NEIGHBOUR_PROJECTION)
+            neighbours = {task["_id"]: task async for task in neighbours_cursor}
+
+        for neighbour_id in neighbour_ids:
+            neighbour = neighbours.get(neighbour_id)
+            if not neighbour:
+                raise HTTPException(
+                    status_code=404, detail="Neighbour task not found")
+            if neighbour["task_list_id"] != task_list_id:
+                raise HTTPException(
+                    status_code=400, detail="Neighbour task is not in the target task list")
+
+        after = neighbours.get(after_id)
+        before = neighbours.get(before_id)
+        others = {"task_list_id": task_list_id, "_id": {"$ne": task_id}}
+
+        if after and not before_id:
+            after_key = {"$gt": after["sort_key"]} if after.get(
+                "sort_key") is not None else {"$type": "string"}
+            before = await task_collection.find_one(
+                {**others, "$or": [{"sort_number": {"$gt": after["sort_number"]}},
+                                   {"sort_number": after["sort_number"], "sort_key": after_key}]},
+                NEIGHBOUR_PROJECTION, sort=TASK_ORDER)
+        elif before and not after_id:
+            earlier = [{"sort_number": {"$lt": before["sort_number"]}}]
+            if before.get("sort_key") is not None:
+                earlier += [{"sort_number": before["sort_number"], "sort_key": None},
+                            {"sort_number": before["sort_number"], "sort_key": {"$lt": before["sort_key"]}}]
+            after = await task_collection.find_one(
+                {**others, "$or": earlier}, NEIGHBOUR_PROJECTION,
+                sort=[(field, -1) for field, _ in TASK_ORDER])
+        elif not after_id and not before_id:
+            after = await task_collection.find_one(
+                others, NEIGHBOUR_PROJECTION, sort=[(field, -1) for field, _ in TASK_ORDER])
+
+        return after, before
@@ -1,13 +1,44 @@
 from ..db.mongo import task_list_collection, task_collection
-from ..schemas.task_list import TaskListCreate, TaskListResponse, TaskListUpdate, TaskListWithTasksResponse
+from ..schemas.task_list import TaskListCreate, TaskListResponse, TaskListUpdate
 from ..schemas.common import prepare_mongo_document
-from ..schemas.task import TaskResponse
+from ..db.pagination import paginate, PAGE_SORT
+from ..db.streaming import stream_json_array
+from ..schemas.encoders import task_list_encoder
+from ..core.config import settings
+from ..db.search import search_filter, add_lowercase_copy
+from ..db.counting import invalidate_counts
+from ..db.tombstones import not_deleted, plan_is_deleted
+from ..db.writes import update_and_return
+from ..db.loader import task_list_loader
+from pymongo import ReturnDocument
+from ..db.sequences import TASK_ORDER
+from .cascade import CascadeDeleteService
+from .versioning import bump_plans, remember_plan_of_task_list
 from ..models.task_list import TaskList
 from fastapi import HTTPException
 from datetime import datetime
 from bson import ObjectId
 
 
+def _tasks_per_plan_pipeline(task_list_ids_by_plan: list, limit: int) -> list:
+    """Aggregation reading the first limit tasks of each plan, in board order
+
+    task_list_ids_by_plan: list -> One list of task list ids per plan
+
+    Each plan is its own $match, $sort and $limit served by the
+    (task_list_id, sort_number, sort_key) index, the later plans joined with
+    $unionWith, so all of them still take a single command.
+    """
+    def plan_stages(task_list_ids: list) -> list:
+        return [{"$match": {"task_list_id": {"$in": task_list_ids}}},
+                {"$sort": dict(TASK_ORDER)},
+                {"$limit": limit}]
+
+    first, *others = task_list_ids_by_plan
+    return plan_stages(first) + [{"$unionWith": {"coll": task_collection.name, "pipeline": plan_stages(task_list_ids)}}
+                                 for task_list_ids in others]
+
+
 class TaskListService:
     @staticmethod
     async def create(task_list: TaskListCreate):
@@ -15,11 +46,14 @@ class TaskListService:
                                   created_at=datetime.utcnow(), updated_at=datetime.utcnow()).model_dump()
         result = await task_list_collection.insert_one(task_list_data)
         task_list_data["_id"] = result.inserted_id
+        invalidate_counts(task_list_collection)
+        remember_plan_of_task_list(task_list_data["_id"], task_list_data["plan_id"])
+        await bump_plans([task_list_data["plan_id"]])
 
         return TaskListResponse(**prepare_mongo_document(task_list_data))
 
     @staticmethod
-    async def find_all_with_pagination(plan_id: str = None, limit: int = 10, skip: int = 0, search: str = "", include_tasks: bool = False):
+    async def find_all_with_pagination(plan_id: str = None, limit: int = 10, skip: int = 0, search: str = "", include_tasks: bool = False, after: str = None):
         query = {}
 
         if plan_id:
@@ -28,33 +62,35 @@ class TaskListService:
             except Exception:
                 raise HTTPException(
                     status_code=400, detail="Invalid plan_id")
+            if await plan_is_deleted(plan_obj_id):
+                raise HTTPException(status_code=404, detail="Plan not found")
             query = {"plan_id": plan_obj_id}
+        query.update(not_deleted())
 
         if search:
-            query["title"] = {"$regex": search, "$options": "i"}
-
-        total_count = await task_list_collection.count_documents(query)
+            query.update(search_filter("title", search))
 
-        task_list_cursor = task_list_collection.find(query).skip(
-            skip).limit(limit).sort("created_at", -1)
+        task_list_docs, total_count, next_cursor = await paginate(
+            task_list_collection, query, limit=limit, skip=skip, after=after)
 
         if include_tasks:
-            task_lists_with_tasks = []
-            async for task_list in task_list_cursor:
-                task_list_dict = prepare_mongo_document(task_list)
-
-                tasks_cursor = task_collection.find(
-                    {"task_list_id": ObjectId(task_list_dict["_id"])})
-                tasks = [TaskResponse(**prepare_mongo_document(task)) async for task in tasks_cursor]
+            await TaskListService.attach_tasks(task_list_docs)
 
-                task_list_dict["tasks"] = tasks
-                task_lists_with_tasks.append(
-                    TaskListWithTasksResponse(**task_list_dict))
+        return {"data": task_list_docs, "count": total_count, "next_cursor": next_cursor}
 
-        else:
-            task_lists = [TaskListResponse(**prepare_mongo_document(task_list)) async for task_list in task_list_cursor]
+    @staticmethod
+    async def stream_all(plan_id: str):
+        """Stream every task list of a plan as JSON, newest first"""
+        try:
+            plan_obj_id = ObjectId(plan_id)
+        except Exception:
+            raise HTTPException(
+                status_code=400, detail="Invalid plan_id")
+        if await plan_is_deleted(plan_obj_id):
+            raise HTTPException(status_code=404, detail="Plan not found")
 
-        return {"data":  task_lists_with_tasks if include_tasks else task_lists, "count": total_count}
+        return stream_json_array(task_list_collection, {"plan_id": plan_obj_id, **not_deleted()}, PAGE_SORT,
+                                 task_list_encoder, batch_size=settings.stream_batch_size)
 
     @staticmethod
     async def find_all_with_tasks(plan_id: str = None):
@@ -67,53 +103,135 @@ class TaskListService:
                 raise HTTPException(
                     status_code=400, detail="Invalid plan_id")
             query = {"plan_id": plan_obj_id}
+        query.update(not_deleted())
+
+        task_lists = await task_list_collection.find(query).to_list(length=None)
+        await TaskListService.attach_tasks(task_lists)
+
+        return task_lists
+
+    @staticmethod
+    async def find_all_with_tasks_for_plans(plan_ids: list, max_tasks_per_plan: int = None):
+        """Prefetch the task lists and tasks of many plans at once
 
-        task_list_cursor = task_list_collection.find(
-            query)
+        Returns a dict of plan id -> {"task_lists": task lists with tasks,
+        "tasks_truncated": whether the plan has more than max_tasks_per_plan
+        tasks}. Always two queries, however many plans are given.
+        """
+        try:
+            plan_obj_ids = [ObjectId(plan_id) for plan_id in plan_ids]
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid plan_id")
 
-        task_lists_with_tasks = []
-        async for task_list in task_list_cursor:
-            task_list_dict = prepare_mongo_document(task_list)
+        boards = {str(plan_id): {"task_lists": [], "tasks_truncated": False} for plan_id in plan_obj_ids}
+        if not plan_obj_ids:
+            return boards
 
-            tasks_cursor = task_collection.find(
-                {"task_list_id": ObjectId(task_list_dict["_id"])})
-            tasks = [TaskResponse(**prepare_mongo_document(task)) async for task in tasks_cursor]
+        task_lists = await task_list_collection.find(
+            {"plan_id": {"$in": plan_obj_ids}, **not_deleted()}).to_list(length=None)
 
-            task_list_dict["tasks"] = tasks
-            task_lists_with_tasks.append(
-                TaskListWithTasksResponse(**task_list_dict))
+        truncated = await TaskListService.attach_tasks(task_lists, max_tasks_per_plan=max_tasks_per_plan)
+        for task_list in task_lists:
+            boards[str(task_list["plan_id"])]["task_lists"].append(task_list)
+        for plan_id in truncated:
+            boards[str(plan_id)]["tasks_truncated"] = True
 
-        return task_lists_with_tasks
+        return boards
+
+    @staticmethod
+    async def attach_tasks(task_lists: list, max_tasks_per_plan: int = None) -> set:
+        """Load the tasks of the given task list documents in one query
+
+        Tasks are fetched ordered by sort_number and sort_key and grouped in
+        memory, so a board costs two round trips no matter how many task
+        lists it has. Each raw task list document gets its raw task documents
+        under "tasks".
+
+        max_tasks_per_plan: int -> Keep the first this many tasks of each plan.
+        The limit is applied by the server, a $limit per plan, so the tasks
+        past it are never read.
+
+        Returns the ids of the plans that had more tasks than the limit.
+        """
+        tasks_by_task_list = {task_list["_id"]: [] for task_list in task_lists}
+        truncated = set()
+
+        if tasks_by_task_list:
+            if max_tasks_per_plan is None:
+                tasks_cursor = task_collection.find(
+                    {"task_list_id": {"$in": list(tasks_by_task_list)}}).sort(TASK_ORDER)
+                async for task in tasks_cursor:
+                    tasks_by_task_list[task["task_list_id"]].append(task)
+            else:
+                task_list_ids_by_plan = {}
+                for task_list in task_lists:
+                    task_list_ids_by_plan.setdefault(task_list["plan_id"], []).append(task_list["_id"])
+                # One more than the limit tells a plan that has more apart
+                task_count_by_plan = {}
+                tasks_cursor = task_collection.aggregate(
+                    _tasks_per_plan_pipeline(list(task_list_ids_by_plan.values()), max_tasks_per_plan + 1))
+                plan_by_task_list = {task_list["_id"]: task_list["plan_id"] for task_list in task_lists}
+                async for task in tasks_cursor:
+                    plan_id = plan_by_task_list[task["task_list_id"]]
+                    task_count_by_plan[plan_id] = task_count_by_plan.get(plan_id, 0) + 1
+                    if task_count_by_plan[plan_id] > max_tasks_per_plan:
+                        truncated.add(plan_id)
+                        continue
+                    tasks_by_task_list[task["task_list_id"]].append(task)
+
+        for task_list in task_lists:
+            task_list["tasks"] = tasks_by_task_list[task_list["_id"]]
+
+        return truncated
 
     @staticmethod
     async def find_by_id(task_list_id: str):
-        task_list = await task_list_collection.find_one({"_id": ObjectId(task_list_id)})
-        if not task_list:
+        task_list = await task_list_loader.load(ObjectId(task_list_id))
+        if not task_list or await plan_is_deleted(task_list["plan_id"]):
             raise HTTPException(status_code=404, detail="Task list not found")
 
         return TaskListResponse(**prepare_mongo_document(task_list))
 
     @staticmethod
     async def update(task_list_id: str, data: TaskListUpdate):
-        update_data = data.model_dump(exclude_unset=True)
+        update_data = add_lowercase_copy(data.model_dump(exclude_unset=True), "title")
         update_data["updated_at"] = datetime.utcnow()
 
         if data.plan_id:
             update_data["plan_id"] = ObjectId(update_data["plan_id"])
 
-        result = await task_list_collection.update_one({"_id": ObjectId(task_list_id)}, {"$set": update_data})
+        # The document as it was, to bump the plan a task list moves out of as well
+        task_list = await update_and_return(task_list_collection, {"_id": ObjectId(task_list_id), **not_deleted()},
+                                            {"$set": update_data}, not_found="Task list not found",
+                                            return_document=ReturnDocument.BEFORE)
+        plan_ids = [task_list["plan_id"]]
+        task_list.update(update_data)
+        plan_ids.append(task_list["plan_id"])
+        if "plan_id" in update_data:
+            invalidate_counts(task_list_collection)
+            remember_plan_of_task_list(task_list_id, task_list["plan_id"])
+        await bump_plans(plan_ids)
 
-        if result.modified_count == 0:
-            raise HTTPException(
-                status_code=404, detail="Task list not found or no changes")
-        return await TaskListService.find_by_id(task_list_id)
+        return TaskListResponse(**prepare_mongo_document(task_list))
 
     @staticmethod
     async def delete(task_list_id: str):
-        result = await task_list_collection.delete_one({"_id": ObjectId(task_list_id)})
-        if result.deleted_count == 0:
+        if settings.soft_delete:
+            task_list = await task_list_collection.find_one_and_update(
+                {"_id": ObjectId(task_list_id), **not_deleted()},
+                {"$set": {"deleted_at": datetime.utcnow()}}, projection={"plan_id": 1})
+            if not task_list:
+                raise HTTPException(
+                    status_code=404, detail="Task list not found")
+            invalidate_counts(task_list_collection)
+            await bump_plans([task_list["plan_id"]])
+            return {"message": "Task list deleted successfully"}
+
+        task_list = await task_list_collection.find_one({"_id": ObjectId(task_list_id), **not_deleted()}, {"plan_id": 1})
+        if not task_list:
             raise HTTPException(
                 status_code=404, detail="Task list not found")
-        await task_collection.delete_many({"task_list_id": ObjectId(task_list_id)})
+        await CascadeDeleteService.delete_task_lists([task_list["_id"]])
+        await bump_plans([task_list["plan_id"]])
 
         return {"message": "Task list deleted successfully"}
@@ -1,57 +1,88 @@
-from ..db.mongo import user_collection
+from ..db.mongo import user_collection, plan_collection
 from ..schemas.user import UserCreate, UserResponse, UserUpdate
 from ..schemas.common import prepare_mongo_document
+from ..db.pagination import paginate
+from ..db.search import search_filter, add_lowercase_copy
+from ..db.counting import invalidate_counts
+from ..db.tombstones import not_deleted
+from ..db.writes import update_and_return
+from ..db.loader import user_loader
 from ..models.user import User
 from fastapi import HTTPException
-from ..core.security import get_password_hash
+from pymongo.errors import DuplicateKeyError
+from ..core.security import get_password_hash_async
+from ..core.cache import TTLCache
+from ..core.config import settings
 from datetime import datetime
 from bson import ObjectId
+import re
+
+# user id -> UserResponse, used to resolve the user of a token
+user_cache = TTLCache(maxsize=settings.user_cache_size,
+                      ttl=settings.user_cache_ttl_seconds, name="user")
+
+# Everything but the password hash, for documents returned to clients
+PUBLIC_USER_PROJECTION = {"password": 0}
+# Domain of the placeholder email of soft-deleted users, reserved so it never clashes with a real one
+DELETED_EMAIL_DOMAIN = "deleted.invalid"
 
 
 class UserService:
     @staticmethod
     async def create(user: UserCreate):
-        if await user_collection.find_one({"email": user.email}):
+        if await user_collection.find_one({"email": user.email, **not_deleted()}, {"_id": 1}):
             raise HTTPException(
                 status_code=400, detail="Email already registered")
 
-        hashed_pass = get_password_hash(user.password)
+        hashed_pass = await get_password_hash_async(user.password)
         user_data = User(username=user.username,
                          email=user.email, password=hashed_pass, created_at=datetime.utcnow(), updated_at=datetime.utcnow()).model_dump()
 
-        result = await user_collection.insert_one(user_data)
+        # The unique email index settles two sign ups racing past the check above
+        try:
+            result = await user_collection.insert_one(user_data)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=400, detail="Email already registered")
         user_data["_id"] = result.inserted_id
+        invalidate_counts(user_collection)
 
         return UserResponse(**prepare_mongo_document(user_data))
 
     @staticmethod
-    async def find_all(limit: int = 10, skip: int = 0, search: str = "", email: str = ""):
-        query = {}
+    async def find_all(limit: int = 10, skip: int = 0, search: str = "", email: str = "", after: str = None):
+        query = {**not_deleted()}
 
         if search:
-            query["username"] = {"$regex": search, "$options": "i"}
+            query.update(search_filter("username", search))
 
         if email:
-            query["email"] = {"$regex": f"^{email}$", "$options": "i"}
-        total_count = await user_collection.count_documents(query)
+            query["email"] = {"$regex": f"^{re.escape(email)}$", "$options": "i"}
+        user_docs, total_count, next_cursor = await paginate(
+            user_collection, query, limit=limit, skip=skip, after=after)
 
-        user_cursor = user_collection.find(query).skip(
-            skip).limit(limit).sort("created_at", -1)
-
-        users = [UserResponse(**prepare_mongo_document(user)) async for user in user_cursor]
-        return {"data": users, "count": total_count}
+        return {"data": user_docs, "count": total_count, "next_cursor": next_cursor}
 
     @staticmethod
     async def find_by_id(user_id: str):
-        user = await user_collection.find_one({"_id": ObjectId(user_id)})
+        user = await user_loader.load(ObjectId(user_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         return UserResponse(**prepare_mongo_document(user))
 
+    @staticmethod
+    async def find_cached_by_id(user_id: str):
+        user = user_cache.get(user_id)
+        if user is None:
+            user = await UserService.find_by_id(user_id)
+            user_cache.set(user_id, user)
+
+        return user
+
     @staticmethod
     async def find_with_pass_by_email(email: str):
-        user = await user_collection.find_one({"email": email})
+        user = await user_collection.find_one({"email": email, **not_deleted()})
         if user:
             return user
         else:
@@ -59,24 +90,45 @@ class UserService:
 
     @staticmethod
     async def update(user_id: str, data: UserUpdate):
-        update_data = data.model_dump(exclude_unset=True)
+        update_data = add_lowercase_copy(data.model_dump(exclude_unset=True), "username")
         if "password" in update_data:
-            update_data["password"] = get_password_hash(
+            update_data["password"] = await get_password_hash_async(
                 update_data["password"])
         update_data["updated_at"] = datetime.utcnow()
 
-        result = await user_collection.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
-
-        if result.modified_count == 0:
+        try:
+            user = await update_and_return(user_collection, {"_id": ObjectId(user_id), **not_deleted()},
+                                           {"$set": update_data}, not_found="User not found",
+                                           projection=PUBLIC_USER_PROJECTION)
+        except DuplicateKeyError:
             raise HTTPException(
-                status_code=404, detail="User not found or no changes")
-        return await UserService.find_by_id(user_id)
+                status_code=400, detail="Email already registered")
+        user_cache.delete(user_id)
+
+        return UserResponse(**prepare_mongo_document(user))
 
     @staticmethod
     async def delete(user_id: str):
-        result = await user_collection.delete_one({"_id": ObjectId(user_id)})
-        if result.deleted_count == 0:
+        if settings.soft_delete:
+            # The email moves aside so it can sign up again right away, the
+            # unique index would still see it on the tombstone otherwise
+            now = datetime.utcnow()
+            result = await user_collection.update_one({"_id": ObjectId(user_id), **not_deleted()}, [
+                {"$set": {"deleted_at": now, "deleted_email": "$email",
+                          "email": f"{user_id}@{DELETED_EMAIL_DOMAIN}"}}])
+            deleted_count = result.matched_count
+            if deleted_count:
+                # Hidden at once, the garbage collector removes them, then the user
+                await plan_collection.update_many({"user_id": ObjectId(user_id), **not_deleted()},
+                                                  {"$set": {"deleted_at": now}})
+                invalidate_counts(plan_collection)
+        else:
+            result = await user_collection.delete_one({"_id": ObjectId(user_id)})
+            deleted_count = result.deleted_count
+        user_cache.delete(user_id)
+        if deleted_count == 0:
             raise HTTPException(
                 status_code=404, detail="User not found")
+        invalidate_counts(user_collection)
 
         return {"message": "User deleted successfully"}
@@ -0,0 +1,49 @@
+from bson import ObjectId
+from ..db.mongo import plan_collection, task_list_collection
+from ..core.response_cache import response_cache
+from ..core.cache import TTLCache
+from ..core.config import settings
+
+# task list id -> plan id, so task writes don't look their plan up each time.
+# Kept short, another worker may move a task list to another plan.
+plan_ids_of_task_lists = TTLCache(maxsize=settings.task_list_plan_cache_size,
+                                  ttl=settings.task_list_plan_cache_ttl_seconds, name="task_list_plans")
+
+
+async def bump_plans(plan_ids):
+    """Increment the version of plans, after a write that changes what their reads return
+
+    Called after the write itself, so a read tagged with the new version
+    never returns the old data. The plans' cached responses are dropped.
+    """
+    plan_ids = list({ObjectId(plan_id) for plan_id in plan_ids if plan_id})
+    if plan_ids:
+        await plan_collection.update_many({"_id": {"$in": plan_ids}}, {"$inc": {"version": 1}})
+        await response_cache.invalidate(*plan_ids)
+
+
+async def bump_plans_of_task_lists(task_list_ids):
+    """Increment the version of the plans the task lists belong to
+
+    Plans are resolved from plan_ids_of_task_lists, only the task lists it
+    misses are read, so a task write usually adds the plan update alone.
+    """
+    task_list_ids = {ObjectId(task_list_id) for task_list_id in task_list_ids if task_list_id}
+    plan_ids = []
+    for task_list_id in list(task_list_ids):
+        plan_id = plan_ids_of_task_lists.get(task_list_id)
+        if plan_id is not None:
+            plan_ids.append(plan_id)
+            task_list_ids.discard(task_list_id)
+
+    if task_list_ids:
+        cursor = task_list_collection.find({"_id": {"$in": list(task_list_ids)}}, {"plan_id": 1})
+        async for task_list in cursor:
+            plan_ids_of_task_lists.set(task_list["_id"], task_list["plan_id"])
+            plan_ids.append(task_list["plan_id"])
+    await bump_plans(plan_ids)
+
+
+def remember_plan_of_task_list(task_list_id, plan_id):
+    """Record the plan of a task list this process created or moved"""
+    plan_ids_of_task_lists.set(ObjectId(task_list_id), ObjectId(plan_id))
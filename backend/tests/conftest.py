@@ -0,0 +1,9 @@
+import os
+
+# Settings needs these to load, nothing in the tests connects to MongoDB
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("MONGO_DB", "tests")
+os.environ.setdefault("SECRET_KEY", "tests")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("VITE_BACKEND_APP_API_URL", "http://localhost:8000")
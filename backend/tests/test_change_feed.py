@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from backend.services import change_feed as change_feed_module
+from backend.services.change_feed import ChangeFeed
+
+PLAN, OTHER_PLAN = str(ObjectId()), str(ObjectId())
+TASK_LIST = ObjectId()
+
+
+def task(task_id, title="Task"):
+    return {"_id": task_id, "title": title, "description": "", "task_list_id": TASK_LIST, "sort_number": 0,
+            "priority": "LOW", "status": "OPEN", "due_date": datetime(2026, 1, 1)}
+
+
+def change(token: str, operation: str, task_id, doc=None, before=None):
+    event = {"_id": {"_data": token}, "operationType": operation, "ns": {"coll": "tasks"},
+             "documentKey": {"_id": task_id}}
+    if doc is not None:
+        event["fullDocument"] = doc
+    if before is not None:
+        event["fullDocumentBeforeChange"] = before
+    return event
+
+
+def feed_with_subscribers():
+    feed = ChangeFeed()
+    feed.horizon = "8200"
+    feed.plan_ids.set(TASK_LIST, PLAN)
+    return feed, feed.subscribe(PLAN), feed.subscribe(OTHER_PLAN)
+
+
+def test_task_delete_goes_to_its_plan_only():
+    feed, subscriber, other = feed_with_subscribers()
+    task_id = ObjectId()
+
+    async def run():
+        await feed._publish(change("8201", "insert", task_id, task(task_id)))
+        await feed._publish(change("8202", "delete", task_id))
+
+    asyncio.run(run())
+    assert [delta["operation"] for delta in feed.since(PLAN, "8200")] == ["insert", "delete"]
+    assert subscriber.queue.qsize() == 2
+    assert other.queue.qsize() == 0
+
+
+def test_task_delete_is_routed_from_the_pre_image():
+    feed, subscriber, other = feed_with_subscribers()
+    task_id = ObjectId()
+
+    asyncio.run(feed._publish(change("8201", "delete", task_id, before=task(task_id))))
+    assert subscriber.queue.qsize() == 1
+    assert other.queue.qsize() == 0
+
+
+def test_unroutable_delete_is_not_broadcast():
+    feed, subscriber, other = feed_with_subscribers()
+
+    asyncio.run(feed._publish(change("8201", "delete", ObjectId())))
+    assert subscriber.queue.qsize() == other.queue.qsize() == 0
+    assert feed.since(PLAN, "8200") == []
+
+
+def test_since_rejects_tokens_it_cannot_answer_for():
+    feed, _, _ = feed_with_subscribers()
+    task_id = ObjectId()
+    asyncio.run(feed._publish(change("8201", "insert", task_id, task(task_id))))
+
+    assert feed.since(PLAN, "8100") is None  # before the stream was opened
+    assert feed.since(PLAN, "not-a-token") is None
+    assert feed.since(PLAN, "8201") == []
+    assert feed.since(PLAN, "8300") == []  # seen by a worker further along
+
+
+class FakeDatabase:
+    """Records the watch options, then stops the feed"""
+
+    def __init__(self, pre_images: bool):
+        self.pre_images = pre_images
+        self.watch_options = None
+
+    async def command(self, *args, **kwargs):
+        if not self.pre_images:
+            raise OperationFailure("BSON field 'changeStreamPreAndPostImages' is an unknown field.")
+
+    def watch(self, pipeline, **options):
+        self.watch_options = options
+        raise asyncio.CancelledError
+
+
+def watch_options(monkeypatch, pre_images: bool) -> dict:
+    database = FakeDatabase(pre_images)
+    monkeypatch.setattr(change_feed_module, "db", database)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(ChangeFeed()._watch())
+    return database.watch_options
+
+
+def test_pre_images_are_only_asked_for_when_recorded(monkeypatch):
+    assert watch_options(monkeypatch, pre_images=True)["full_document_before_change"] == "whenAvailable"
+    assert "full_document_before_change" not in watch_options(monkeypatch, pre_images=False)
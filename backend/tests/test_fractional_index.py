@@ -0,0 +1,41 @@
+import random
+import pytest
+from backend.core.fractional_index import DIGITS, key_between
+
+
+def test_key_between_respects_its_bounds():
+    assert key_between() not in ("", None)
+    assert key_between("V") > "V"
+    assert key_between(None, "V") < "V"
+    assert "V" < key_between("V", "W") < "W"
+    assert "V" < key_between("V", "V1") < "V1"
+
+
+def test_key_between_rejects_unordered_bounds():
+    with pytest.raises(ValueError):
+        key_between("b", "a")
+    with pytest.raises(ValueError):
+        key_between("a", "a")
+
+
+def test_repeated_inserts_at_the_front_and_back_stay_ordered():
+    keys = [key_between()]
+    for _ in range(200):
+        keys.insert(0, key_between(None, keys[0]))
+        keys.append(key_between(keys[-1], None))
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+
+def test_random_inserts_stay_ordered_and_never_end_with_the_lowest_digit():
+    rng = random.Random(0)
+    keys = []
+    for _ in range(2000):
+        position = rng.randrange(len(keys) + 1)
+        lower = keys[position - 1] if position > 0 else None
+        upper = keys[position] if position < len(keys) else None
+        key = key_between(lower, upper)
+        assert (lower is None or lower < key) and (upper is None or key < upper)
+        assert not key.endswith(DIGITS[0])
+        keys.insert(position, key)
+    assert keys == sorted(keys)
@@ -0,0 +1,27 @@
+import base64
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from backend.db.pagination import after_cursor_query, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "created_at": datetime(2026, 10, 18, 7, 26, 7, 123000)}
+    assert decode_cursor(encode_cursor(doc)) == (doc["created_at"], doc["_id"])
+
+
+@pytest.mark.parametrize("token", ["not-a-cursor", "", base64.urlsafe_b64encode(b'["2026-10-18", "not-an-id"]').decode()])
+def test_invalid_cursor_is_a_400(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+
+def test_after_cursor_query_continues_after_the_position():
+    doc = {"_id": ObjectId(), "created_at": datetime(2026, 10, 18)}
+    query = {"plan_id": ObjectId()}
+    assert after_cursor_query(query, encode_cursor(doc)) == {"$and": [query, {"$or": [
+        {"created_at": {"$lt": doc["created_at"]}},
+        {"created_at": doc["created_at"], "_id": {"$lt": doc["_id"]}},
+    ]}]}
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from backend.core.response_cache import CacheBackend, LocalRedis, LRUBackend, RedisBackend, ResponseCache
+
+
+def shared_caches():
+    """Two workers' caches over the same Redis"""
+    client = LocalRedis()
+    return ResponseCache(RedisBackend(client), ttl=60), ResponseCache(RedisBackend(client), ttl=60)
+
+
+def test_backend_must_implement_every_method():
+    class Partial(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_concurrent_misses_share_one_load():
+    cache, _ = shared_caches()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return b"board"
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_load("plan", 1, {}, load) for _ in range(10)])
+
+    assert asyncio.run(run()) == [b"board"] * 10
+    assert len(loads) == 1
+
+
+def test_entries_are_shared_between_workers():
+    worker_a, worker_b = shared_caches()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return b"board"
+
+    async def run():
+        await worker_a.get_or_load("plan", 1, {}, load)
+        return await worker_b.get_or_load("plan", 1, {}, load)
+
+    assert asyncio.run(run()) == b"board"
+    assert len(loads) == 1
+
+
+def test_invalidate_drops_the_plan_for_every_worker():
+    worker_a, worker_b = shared_caches()
+    loads = []
+
+    def loader(body):
+        async def load():
+            loads.append(body)
+            return body
+        return load
+
+    async def run():
+        await worker_a.get_or_load("plan", 1, {}, loader(b"old"))
+        await worker_a.get_or_load("other", 1, {}, loader(b"other"))
+        await worker_b.invalidate("plan")
+        return (await worker_a.get_or_load("plan", 1, {}, loader(b"new")),
+                await worker_a.get_or_load("other", 1, {}, loader(b"reloaded")))
+
+    assert asyncio.run(run()) == (b"new", b"other")
+    assert loads == [b"old", b"other", b"new"]
+
+
+def test_lru_backend_deletes_only_the_plan_keys():
+    backend = LRUBackend(maxsize=2, ttl=60)
+
+    async def run():
+        await backend.set("a", "a:1", b"1", 60)
+        await backend.set("b", "b:1", b"2", 60)
+        await backend.set("a", "a:2", b"3", 60)  # evicts a:1
+        await backend.delete_plan("a")
+        return await backend.get("a:2"), await backend.get("b:1"), backend.keys_by_plan
+
+    assert asyncio.run(run()) == (None, b"2", {"b": {"b:1"}})
@@ -0,0 +1,24 @@
+from backend.db.search import search_filter, add_lowercase_copy
+from backend.models.task import Task
+from backend.services.search_index import PlanIndex
+
+
+def test_prefix_search_is_anchored_on_the_lowercase_copy():
+    assert search_filter("title", "Gar.den", backend="prefix") == {"title_lower": {"$regex": "^gar\\.den"}}
+
+
+def test_writes_store_the_lowercase_copy():
+    assert add_lowercase_copy({"title": "Plant Garlic"}, "title")["title_lower"] == "plant garlic"
+    assert "title_lower" not in add_lowercase_copy({"status": "OPEN"}, "title")
+    task = Task(title="Plant Garlic", description="", task_list_id="0" * 24, due_date="2026-01-01T00:00:00",
+                sort_number=0, priority="LOW", status="OPEN")
+    assert task.model_dump()["title_lower"] == "plant garlic"
+
+
+def test_plan_index_ranks_whole_words_above_prefixes():
+    index = PlanIndex(0, [{"id": "1", "title": "Garage sale"}, {"id": "2", "title": "Water the garden"},
+                          {"id": "3", "title": "Garden plan"}, {"id": "4", "title": "Kitchen"}])
+    hits = sorted(index.search(["garden"]), key=lambda hit: hit[1]["id"])
+    assert [(score, entry["id"]) for score, entry in hits] == [(2, "2"), (2, "3")]
+    assert sorted(entry["id"] for _, entry in index.search(["gar"])) == ["1", "2", "3"]
+    assert [entry["id"] for _, entry in index.search(["gar", "plan"])] == ["3"]
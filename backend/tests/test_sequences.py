@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+from bson import ObjectId
+from backend.db import sequences
+
+TASK_LIST = ObjectId()
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    return all(doc.get(key) == value for key, value in query.items())
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for key, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: (doc.get(key) is not None, doc.get(key)), reverse=direction < 0)
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeTasks:
+    """Just enough of a collection for rebalance_task_list, before_write runs before each bulk_write"""
+
+    def __init__(self, docs, before_write=None):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.before_write = before_write
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.before_write:
+            self.before_write(self)
+            self.before_write = None
+        matched = 0
+        for operation in operations:
+            doc = self.docs.get(operation._filter["_id"])
+            if doc is not None and _matches(doc, operation._filter):
+                doc.update(operation._doc["$set"])
+                matched += 1
+        return SimpleNamespace(matched_count=matched, modified_count=matched)
+
+
+class FakeCounters:
+    async def bulk_write(self, operations, ordered=True):
+        pass
+
+
+def run_rebalance(monkeypatch, tasks):
+    monkeypatch.setattr(sequences, "task_collection", tasks)
+    monkeypatch.setattr(sequences, "task_list_counter_collection", FakeCounters())
+    return asyncio.run(sequences.rebalance_task_list(TASK_LIST))
+
+
+def task(sort_number, sort_key=None):
+    return {"_id": ObjectId(), "task_list_id": TASK_LIST, "sort_number": sort_number, "sort_key": sort_key}
+
+
+def board_order(tasks: FakeTasks) -> list:
+    return [doc["_id"] for doc in FakeCursor(list(tasks.docs.values())).sort(sequences.TASK_ORDER + [("_id", 1)]).docs]
+
+
+def test_rebalance_renumbers_in_order(monkeypatch):
+    docs = [task(0), task(1, "V"), task(1, "k"), task(5)]
+    tasks = FakeTasks(docs)
+    expected = board_order(tasks)
+
+    assert run_rebalance(monkeypatch, tasks) == 3
+    assert board_order(tasks) == expected
+    assert [(tasks.docs[_id]["sort_number"], tasks.docs[_id]["sort_key"]) for _id in expected] == \
+        [(0, None), (1, None), (2, None), (3, None)]
+
+
+def test_a_move_during_a_rebalance_is_kept(monkeypatch):
+    first, second, moved = task(0, "V"), task(0, "k"), task(3, "x")
+
+    def move_to_front(tasks):
+        # A drag landing between the rebalance's read and its write
+        tasks.docs[moved["_id"]].update(sort_number=0, sort_key="0V")
+
+    tasks = FakeTasks([first, second, moved], before_write=move_to_front)
+    run_rebalance(monkeypatch, tasks)
+
+    # Not put back at the end, where the rebalance had read it
+    order = board_order(tasks)
+    assert order.index(moved["_id"]) < order.index(second["_id"])
+    # The retry renumbered the list around the move
+    assert [(tasks.docs[_id]["sort_number"], tasks.docs[_id]["sort_key"]) for _id in order] == \
+        [(0, None), (1, None), (2, None)]
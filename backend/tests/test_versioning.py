@@ -0,0 +1,46 @@
+import asyncio
+from bson import ObjectId
+from backend.services import versioning
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeTaskLists:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return FakeCursor([self.docs[_id] for _id in query["_id"]["$in"] if _id in self.docs])
+
+
+def test_plans_of_task_lists_are_only_read_once(monkeypatch):
+    plan_id, task_list_id = ObjectId(), ObjectId()
+    task_lists = FakeTaskLists([{"_id": task_list_id, "plan_id": plan_id}])
+    bumped = []
+
+    async def bump_plans(plan_ids):
+        bumped.append(list(plan_ids))
+
+    monkeypatch.setattr(versioning, "task_list_collection", task_lists)
+    monkeypatch.setattr(versioning, "bump_plans", bump_plans)
+    monkeypatch.setattr(versioning, "plan_ids_of_task_lists", versioning.TTLCache(maxsize=10, ttl=60))
+
+    asyncio.run(versioning.bump_plans_of_task_lists([str(task_list_id)]))
+    asyncio.run(versioning.bump_plans_of_task_lists([str(task_list_id)]))
+    assert bumped == [[plan_id], [plan_id]]
+    assert task_lists.finds == 1
+
+    other_plan_id = ObjectId()
+    versioning.remember_plan_of_task_list(task_list_id, other_plan_id)
+    asyncio.run(versioning.bump_plans_of_task_lists([task_list_id]))
+    assert bumped[-1] == [other_plan_id]
+    assert task_lists.finds == 1